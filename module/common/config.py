@@ -11,7 +11,9 @@
 from module.config.option import ConfigOption
 from module.config.base import ConfigBase
 from module.config import common_config_section_name
-from module.common.logging import log_file_max_rotation, log_file_max_size_in_mb
+from module.common.logging import get_logger, log_file_max_rotation, log_file_max_size_in_mb
+
+log = get_logger()
 
 
 class CommonConfig(ConfigBase):
@@ -52,7 +54,24 @@ class CommonConfig(ConfigBase):
                          Log file will be rotated maximum {log_file_max_rotation} times once
                          the log file reaches size of {log_file_max_size_in_mb} MB
                          """,
-                         default_value="log/netbox_sync.log")
+                         default_value="log/netbox_sync.log"),
+
+            ConfigOption("max_parallel_sources",
+                         int,
+                         description="""Number of sources which retrieve their data at the same time.
+                         The retrieved data is added to the inventory one source after another
+                         in the order the sources are defined in the config.
+                         """,
+                         default_value=1)
         ]
 
         super().__init__()
+
+    def validate_options(self):
+
+        for option in self.options:
+
+            if option.key == "max_parallel_sources" and option.value is not None and option.value < 1:
+                log.error(f"Config option '{option.key}' in '{CommonConfig.section_name}' "
+                          f"must be 1 or greater, got: {option.value}")
+                self.set_validation_failed()
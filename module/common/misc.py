@@ -9,6 +9,7 @@
 
 import sys
 import re
+from functools import lru_cache
 
 
 def grab(structure=None, path=None, separator=".", fallback=None):
@@ -55,41 +56,74 @@ def grab(structure=None, path=None, separator=".", fallback=None):
 
     max_recursion_level = 100
 
-    current_level = 0
-    levels = len(path.split(separator))
-
     if structure is None or path is None:
         return fallback
 
-    # noinspection PyBroadException
-    def traverse(r_structure, r_path):
-        nonlocal current_level
-        current_level += 1
+    path_elements = compile_grab_path(path, separator)
 
-        if current_level > max_recursion_level:
-            return fallback
+    if len(path_elements) > max_recursion_level:
+        return fallback
 
-        for attribute in r_path.split(separator):
-            if isinstance(r_structure, dict):
-                r_structure = {k.lower(): v for k, v in r_structure.items()}
+    data = structure
+    for attribute, attribute_lower, index in path_elements:
 
+        if isinstance(data, list):
+            if index is None:
+                return fallback
             try:
-                if isinstance(r_structure, list):
-                    data = r_structure[int(attribute)]
-                elif isinstance(r_structure, dict):
-                    data = r_structure.get(attribute.lower())
-                else:
-                    data = getattr(r_structure, attribute)
+                data = data[index]
+            except IndexError:
+                return fallback
 
+        elif isinstance(data, dict):
+            if attribute in data:
+                data = data[attribute]
+            else:
+                # fall back to case-insensitive match, last matching key wins
+                data_found = None
+                for key, value in data.items():
+                    if isinstance(key, str) and key.lower() == attribute_lower:
+                        data_found = value
+                data = data_found
+
+        else:
+            # noinspection PyBroadException
+            try:
+                data = getattr(data, attribute)
             except Exception:
                 return fallback
 
-            if current_level == levels:
-                return data if data is not None else fallback
-            else:
-                return traverse(data, separator.join(r_path.split(separator)[1:]))
+    return data if data is not None else fallback
+
+
+@lru_cache(maxsize=4096)
+def compile_grab_path(path, separator="."):
+    """
+    Split a grab() path into its elements once. Results are cached, as grab() is called
+    with the same few paths over and over again.
+
+    Parameters
+    ----------
+    path: str
+        nested path to split
+    separator: str
+        path separator
+
+    Returns
+    -------
+    tuple: of (attribute, lower case attribute, list index or None) for each path element
+    """
+
+    path_elements = list()
+    for attribute in path.split(separator):
+        try:
+            index = int(attribute)
+        except ValueError:
+            index = None
+
+        path_elements.append((attribute, attribute.lower(), index))
 
-    return traverse(structure, path)
+    return tuple(path_elements)
 
 
 def dump(obj):
@@ -15,6 +15,7 @@ from module.config.option import ConfigOption
 from module.common.config import CommonConfig
 from module.netbox.config import NetBoxConfig
 from module.sources.vmware.config import VMWareConfig
+from module.sources.vclouddirector.config import VCloudDirectorConfig
 from module.sources.check_redfish.config import CheckRedfishConfig
 from module.common.logging import get_logger
 from module.config import default_config_file_path, source_config_section_name
@@ -33,6 +34,7 @@ class ConfigFileOutput(DescriptionFormatterMixin):
 
     source_config_list = [
         VMWareConfig,
+        VCloudDirectorConfig,
         CheckRedfishConfig
     ]
 
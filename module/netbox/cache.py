@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+import json
+import os
+import sqlite3
+
+from module.common.logging import get_logger
+from module import __version__
+
+log = get_logger()
+
+
+class NetBoxCache:
+    """
+    Stores NetBox objects in a SQLite database to reduce the amount of data which needs
+    to be requested from NetBox on each run.
+
+    Each object is stored as a separate row. This way only changed objects need to be written
+    and the latest update of an object type can be determined without reading all objects.
+
+    The cache gets invalidated if the NetBox host, the NetBox API version, the netbox-sync version
+    or the cache schema version changed since the cache has been written.
+    """
+
+    file_name = "netbox-cache.sqlite3"
+
+    # needs to be raised every time the database layout changes
+    schema_version = "1"
+
+    def __init__(self, cache_directory, netbox_host=None, netbox_api_version=None):
+
+        self.cache_file = f"{cache_directory}{os.sep}{self.file_name}"
+        self.connection = None
+
+        self.cache_metadata = {
+            "schema_version": self.schema_version,
+            "netbox_sync_version": __version__,
+            "netbox_host": f"{netbox_host}",
+            "netbox_api_version": f"{netbox_api_version}"
+        }
+
+        if os.path.exists(self.cache_file) and not os.access(self.cache_file, os.R_OK | os.W_OK):
+            log.warning(f"Got no permission to read/write existing cache file: {self.cache_file}")
+            return
+
+        try:
+            self.connection = sqlite3.connect(self.cache_file)
+            self.setup()
+        except sqlite3.Error as e:
+            log.warning(f"Unable to open cache file '{self.cache_file}': {e}")
+            self.close()
+
+    def is_available(self) -> bool:
+        """
+        Returns
+        -------
+        bool: True if cache can be used
+        """
+
+        return self.connection is not None
+
+    def setup(self):
+        """
+        Create database tables if they don't exist and invalidate the cache if the
+        cache metadata does not match the current metadata.
+        """
+
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS objects ("
+                                    "object_type TEXT NOT NULL, "
+                                    "id INTEGER NOT NULL, "
+                                    "last_updated TEXT, "
+                                    "data TEXT NOT NULL, "
+                                    "PRIMARY KEY (object_type, id))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS objects_last_updated "
+                                    "ON objects (object_type, last_updated)")
+
+        current_metadata = dict(self.connection.execute("SELECT key, value FROM metadata").fetchall())
+
+        # additional metadata values (see set_metadata()) don't affect cache validity
+        if {x: current_metadata.get(x) for x in self.cache_metadata.keys()} == self.cache_metadata:
+            return
+
+        if len(current_metadata) > 0:
+            changed_keys = [x for x in self.cache_metadata.keys()
+                            if current_metadata.get(x) != self.cache_metadata.get(x)]
+            log.info(f"Invalidating NetBox cache, changed cache attributes: {', '.join(changed_keys)}")
+
+        with self.connection:
+            self.connection.execute("DELETE FROM objects")
+            self.connection.execute("DELETE FROM metadata")
+            self.connection.executemany("INSERT INTO metadata (key, value) VALUES (?, ?)",
+                                        self.cache_metadata.items())
+
+    def get_metadata(self, key):
+        """
+        Return a value stored in the cache metadata.
+
+        Parameters
+        ----------
+        key: str
+            name of the metadata value
+
+        Returns
+        -------
+        str, None: stored value, None if value is not present
+        """
+
+        if self.is_available() is False:
+            return None
+
+        result = self.connection.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+
+        if result is None:
+            return None
+
+        return result[0]
+
+    def set_metadata(self, key, value) -> bool:
+        """
+        Store a value in the cache metadata. The value is removed if the cache gets invalidated.
+
+        Parameters
+        ----------
+        key: str
+            name of the metadata value
+        value: str, int, float
+            value to store
+
+        Returns
+        -------
+        bool: True if value has been stored successfully
+        """
+
+        if self.is_available() is False:
+            return False
+
+        if key in self.cache_metadata.keys():
+            raise ValueError(f"Cache metadata key '{key}' is reserved")
+
+        try:
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+                                        (key, f"{value}"))
+        except sqlite3.Error as e:
+            log.warning(f"Failed to write metadata '{key}' to cache file: {e}")
+            return False
+
+        return True
+
+    def get_objects(self, object_class) -> list:
+        """
+        Return all cached objects of an object type.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            object type to return objects for
+
+        Returns
+        -------
+        list: of object data dicts
+        """
+
+        return list(self.iterate_objects(object_class))
+
+    def iterate_objects(self, object_class):
+        """
+        Generator which returns all cached objects of an object type one by one.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            object type to return objects for
+
+        Returns
+        -------
+        generator: of object data dicts
+        """
+
+        if self.is_available() is False:
+            return
+
+        cursor = self.connection.execute("SELECT data FROM objects WHERE object_type = ? ORDER BY id",
+                                         (object_class.__name__,))
+
+        for row in cursor:
+            yield json.loads(row[0])
+
+    def get_object_ids(self, object_class) -> set:
+        """
+        Return the IDs of all cached objects of an object type.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            object type to return object IDs for
+
+        Returns
+        -------
+        set: of object IDs
+        """
+
+        if self.is_available() is False:
+            return set()
+
+        cursor = self.connection.execute("SELECT id FROM objects WHERE object_type = ?", (object_class.__name__,))
+
+        return {x[0] for x in cursor}
+
+    def get_latest_update(self, object_class):
+        """
+        Return the latest 'last_updated' value of all cached objects of an object type.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            object type to return latest update for
+
+        Returns
+        -------
+        str, None: latest 'last_updated' value, None if no cached objects provide this attribute
+        """
+
+        if self.is_available() is False:
+            return None
+
+        return self.connection.execute("SELECT MAX(last_updated) FROM objects WHERE object_type = ?",
+                                       (object_class.__name__,)).fetchone()[0]
+
+    def update_objects(self, object_class, objects=None, removed_ids=None, replace=False) -> bool:
+        """
+        Add/Update and remove cached objects of an object type within a single transaction.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            object type of the objects
+        objects: list
+            object data dicts which should be added or updated
+        removed_ids: set, list
+            IDs of objects which should be removed from cache
+        replace: bool
+            if True all cached objects of this type will be replaced with 'objects'
+
+        Returns
+        -------
+        bool: True if cache has been updated successfully
+        """
+
+        if self.is_available() is False:
+            return False
+
+        object_type = object_class.__name__
+
+        try:
+            with self.connection:
+                if replace is True:
+                    self.connection.execute("DELETE FROM objects WHERE object_type = ?", (object_type,))
+
+                if removed_ids is not None and len(removed_ids) > 0:
+                    self.connection.executemany("DELETE FROM objects WHERE object_type = ? AND id = ?",
+                                                [(object_type, x) for x in removed_ids])
+
+                if objects is not None and len(objects) > 0:
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO objects (object_type, id, last_updated, data) VALUES (?, ?, ?, ?)",
+                        [(object_type, x.get("id"), x.get("last_updated"), json.dumps(x)) for x in objects]
+                    )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            log.warning(f"Failed to write {object_class.name} objects to cache file: {e}")
+            return False
+
+        return True
+
+    def write_pages(self, object_class, pages, replace=False):
+        """
+        Generator which writes pages of objects to the cache and passes them on unchanged.
+        All pages are written within a single transaction which is committed once the last page
+        has been passed on. If reading pages fails, the cache remains unchanged.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            object type of the objects
+        pages: iterable
+            of lists of object data dicts
+        replace: bool
+            if True all cached objects of this type will be replaced with objects of all pages
+
+        Returns
+        -------
+        generator: of lists of object data dicts
+        """
+
+        if self.is_available() is False:
+            yield from pages
+            return
+
+        object_type = object_class.__name__
+        write_failed = False
+
+        with self.connection:
+            if replace is True:
+                self.connection.execute("DELETE FROM objects WHERE object_type = ?", (object_type,))
+
+            for page in pages:
+                if write_failed is False:
+                    try:
+                        self.connection.executemany(
+                            "INSERT OR REPLACE INTO objects (object_type, id, last_updated, data) "
+                            "VALUES (?, ?, ?, ?)",
+                            [(object_type, x.get("id"), x.get("last_updated"), json.dumps(x)) for x in page]
+                        )
+                    except (sqlite3.Error, TypeError, ValueError) as e:
+                        log.warning(f"Failed to write {object_class.name} objects to cache file: {e}")
+                        write_failed = True
+
+                yield page
+
+            # remove all cached objects of this type, otherwise the cache would be incomplete
+            if write_failed is True:
+                self.connection.execute("DELETE FROM objects WHERE object_type = ?", (object_type,))
+
+    def close(self):
+
+        if self.connection is None:
+            return
+
+        try:
+            self.connection.close()
+        except sqlite3.Error as e:
+            log.warning(f"Unable to close cache file '{self.cache_file}': {e}")
+
+        self.connection = None
+
+# EOF
@@ -118,6 +118,21 @@ class NetBoxConfig(ConfigBase):
                          """,
                          default_value=4),
 
+            ConfigOption("max_parallel_requests",
+                         int,
+                         description="""The maximum number of requests which will be sent to NetBox in parallel
+                         while retrieving paginated results or sending independent objects to NetBox.
+                         Setting it to 1 will send all requests one after another.
+                         """,
+                         default_value=4),
+
+            ConfigOption("bulk_request_chunk_size",
+                         int,
+                         description="""The maximum number of objects which will be created, updated or deleted
+                         with a single bulk request. Setting it to 1 will send a request for each object.
+                         """,
+                         default_value=100),
+
             ConfigOption("use_caching",
                          bool,
                          description="""Defines if caching of NetBox objects is used or not.
@@ -128,7 +143,24 @@ class NetBoxConfig(ConfigBase):
             ConfigOption("cache_directory_location",
                          str,
                          description="The location of the directory where the cache files should be stored",
-                         default_value="cache")
+                         default_value="cache"),
+
+            ConfigOption("use_changelog_to_detect_deletions",
+                         bool,
+                         description="""If enabled, objects deleted in NetBox since the last run are detected by
+                         reading delete actions from the NetBox change log instead of requesting a list of all
+                         existing objects. The NetBox API token needs permission to view the change log.
+                         A full list of objects is still requested if the change log does not reach back far
+                         enough or 'full_object_listing_interval_in_hours' has passed.
+                         """,
+                         default_value=False),
+
+            ConfigOption("full_object_listing_interval_in_hours",
+                         int,
+                         description="""The interval in hours in which a full list of all existing objects
+                         is requested to detect deleted objects if 'use_changelog_to_detect_deletions' is enabled.
+                         """,
+                         default_value=24)
         ]
 
         super().__init__()
@@ -137,6 +169,13 @@ class NetBoxConfig(ConfigBase):
 
         for option in self.options:
 
+            if option.key in ["max_parallel_requests", "bulk_request_chunk_size",
+                              "full_object_listing_interval_in_hours"] and \
+                    option.value is not None and option.value < 1:
+                log.error(f"Config option '{option.key}' in '{NetBoxConfig.section_name}' "
+                          f"must be 1 or greater, got: {option.value}")
+                self.set_validation_failed()
+
             if option.key == "proxy" and option.value is not None:
                 if "://" not in option.value or \
                         (not option.value.startswith("http") and not option.value.startswith("socks5")):
@@ -9,10 +9,12 @@
 
 import json
 import os
-import pickle
 import pprint
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from http.client import HTTPConnection
+from urllib.parse import urlparse, parse_qs, urlencode
 
 import urllib3
 import requests
@@ -23,6 +25,8 @@ from module.common.misc import grab, do_error_exit, plural
 from module.netbox import *
 from module.netbox.inventory import NetBoxInventory
 from module.netbox.config import NetBoxConfig
+from module.netbox.cache import NetBoxCache
+from module.netbox.merge import NetBoxDataMerge
 from module import __version__
 
 log = get_logger()
@@ -52,6 +56,9 @@ class NetBoxHandler:
     # cache directory path
     cache_directory = None
 
+    # NetBoxCache instance
+    cache = None
+
     # this is only used to speed up testing, NEVER SET TO True IN PRODUCTION
     testing_cache = False
 
@@ -138,10 +145,27 @@ class NetBoxHandler:
             log.warning(f"Error writing to cache directory: {self.cache_directory}")
             self.settings.use_caching = False
 
+        if self.settings.use_caching is True:
+
+            # remove cache files of previous versions
+            for nb_object_class in NetBoxObject.__subclasses__():
+                legacy_cache_file = f"{self.cache_directory}{os.sep}{nb_object_class.__name__}.cache"
+                if os.path.isfile(legacy_cache_file):
+                    try:
+                        os.remove(legacy_cache_file)
+                    except OSError as e:
+                        log.debug(f"Unable to remove legacy cache file '{legacy_cache_file}': {e}")
+
+            self.cache = NetBoxCache(self.cache_directory, self.settings.host_fqdn, self.inventory.netbox_api_version)
+
+            if self.cache.is_available() is False:
+                self.settings.use_caching = False
+
         if self.settings.use_caching is False:
             log.warning("NetBox caching DISABLED")
         else:
             log.debug(f"Successfully configured cache directory: {self.cache_directory}")
+            self.inventory.cache_directory = self.cache_directory
 
     def create_session(self) -> requests.Session:
         """
@@ -161,6 +185,11 @@ class NetBoxHandler:
         session = requests.Session()
         session.headers.update(header)
 
+        # make sure the connection pool is big enough for parallel requests
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(self.settings.max_parallel_requests, 10))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
         # adds proxy to the session
         if self.settings.proxy is not None:
             session.proxies.update({
@@ -181,6 +210,9 @@ class NetBoxHandler:
 
     def finish(self):
 
+        if self.cache is not None:
+            self.cache.close()
+
         # closing NetBox connection
         try:
             self.session.close()
@@ -221,8 +253,8 @@ class NetBoxHandler:
             class definition of the desired NetBox object
         req_type: str
             GET, PATCH, PUT, DELETE
-        data: dict
-            data which shall be send to NetBox
+        data: (dict, list)
+            data which shall be send to NetBox. A list of objects will be sent as bulk request
         params: dict
             dict of URL params which should be passed to NetBox
         nb_id: int
@@ -273,26 +305,26 @@ class NetBoxHandler:
         if response.status_code == 200:
 
             # retrieve paginated results
-            if this_request.method == "GET" and result is not None:
-                while response.json().get("next") is not None:
-                    this_request.url = response.json().get("next")
-                    log.debug2("NetBox results are paginated. Getting next page")
-
-                    response = self.single_request(this_request)
-                    result["results"].extend(response.json().get("results"))
+            if this_request.method == "GET" and result is not None and result.get("next") is not None:
+                result["results"].extend(self.request_remaining_pages(this_request, result))
 
         elif response.status_code in [201, 204]:
 
             action = "created" if response.status_code == 201 else "deleted"
 
-            if req_type == "DELETE":
-                object_name = self.inventory.get_by_id(object_class, nb_id)
-                if object_name is not None:
-                    object_name = object_name.get_display_name()
+            # bulk request
+            if isinstance(data, list):
+                log.info(f"NetBox successfully {action} {len(data)} {object_class.name} object{plural(len(data))}.")
+
             else:
-                object_name = result.get(object_class.primary_key)
+                if req_type == "DELETE":
+                    object_name = self.inventory.get_by_id(object_class, nb_id)
+                    if object_name is not None:
+                        object_name = object_name.get_display_name()
+                else:
+                    object_name = result.get(object_class.primary_key)
 
-            log.info(f"NetBox successfully {action} {object_class.name} object '{object_name}'.")
+                log.info(f"NetBox successfully {action} {object_class.name} object '{object_name}'.")
 
             if response.status_code == 204:
                 result = True
@@ -315,7 +347,172 @@ class NetBoxHandler:
 
         return result
 
-    def single_request(self, this_request):
+    def request_remaining_pages(self, this_request, first_page):
+        """
+        Request all remaining pages of a paginated GET request.
+
+        Parameters
+        ----------
+        this_request: requests.session.prepare_request
+            object of the prepared request of the first page
+        first_page: dict
+            the returned data of the first page
+
+        Returns
+        -------
+        list: of results of all remaining pages in order of the pages
+        """
+
+        results = list()
+        for page_results in self.iterate_remaining_pages(this_request, first_page):
+            results.extend(page_results)
+
+        return results
+
+    def iterate_remaining_pages(self, this_request, first_page):
+        """
+        Generator which returns the results of all remaining pages of a paginated GET request page by page.
+        The offsets of all remaining pages are calculated from the object count of the first page.
+        These pages are requested in parallel using up to 'max_parallel_requests' requests at the same time.
+        Pages are always returned in order and not more than 'max_parallel_requests' pages are requested
+        ahead of the page which has been returned last.
+
+        Parameters
+        ----------
+        this_request: requests.session.prepare_request
+            object of the prepared request of the first page
+        first_page: dict
+            the returned data of the first page
+
+        Returns
+        -------
+        generator: of lists of results of each page
+        """
+
+        next_url = first_page.get("next")
+        object_count = first_page.get("count")
+
+        if next_url is None:
+            return
+
+        next_url_parsed = urlparse(next_url)
+        next_url_params = parse_qs(next_url_parsed.query)
+
+        try:
+            limit = int(next_url_params.get("limit")[0])
+            offset = int(next_url_params.get("offset")[0])
+        except (TypeError, ValueError):
+            limit = offset = None
+
+        if self.settings.max_parallel_requests > 1 and isinstance(object_count, int) and \
+                limit is not None and limit > 0:
+
+            page_requests = list()
+            for page_offset in range(offset, object_count, limit):
+                next_url_params["offset"] = [page_offset]
+
+                page_request = this_request.copy()
+                page_request.url = next_url_parsed._replace(query=urlencode(next_url_params, doseq=True)).geturl()
+                page_requests.append(page_request)
+
+            log.debug2(f"NetBox results are paginated. Getting {len(page_requests)} remaining "
+                       f"page{plural(len(page_requests))} with up to {self.settings.max_parallel_requests} "
+                       f"parallel requests")
+
+            next_url = None
+            with ThreadPoolExecutor(max_workers=self.settings.max_parallel_requests) as executor:
+
+                pending_responses = deque()
+                for page_request in page_requests:
+                    pending_responses.append(executor.submit(self.single_request, page_request))
+
+                    if len(pending_responses) < self.settings.max_parallel_requests:
+                        continue
+
+                    page = self.get_page_of_results(pending_responses.popleft().result())
+                    next_url = page.get("next")
+                    yield page.get("results")
+
+                while len(pending_responses) > 0:
+                    page = self.get_page_of_results(pending_responses.popleft().result())
+                    next_url = page.get("next")
+                    yield page.get("results")
+
+        # objects could have been added while requesting pages, get pages one by one as long as more data is present
+        while next_url is not None:
+            log.debug2("NetBox results are paginated. Getting next page")
+
+            page_request = this_request.copy()
+            page_request.url = next_url
+
+            page = self.get_page_of_results(self.single_request(page_request))
+            next_url = page.get("next")
+            yield page.get("results")
+
+    def request_pages(self, object_class, params=None):
+        """
+        Generator which requests all objects of a NetBox object type and returns the results page by page.
+        This way the results can be processed while the remaining pages are requested and only a few pages
+        need to be kept in memory at the same time. The program will exit if a request fails.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            class definition of the desired NetBox object
+        params: dict
+            dict of URL params which should be passed to NetBox
+
+        Returns
+        -------
+        generator: of lists of results of each page
+        """
+
+        params = dict(params or dict())
+
+        if "limit" not in params.keys():
+            params["limit"] = self.settings.default_netbox_result_limit
+
+        # always exclude config context
+        params["exclude"] = "config_context"
+
+        this_request = self.session.prepare_request(
+                            requests.Request("GET", f"{self.url}{object_class.api_path}/", params=params)
+                       )
+
+        first_page = self.get_page_of_results(self.single_request(this_request))
+
+        yield first_page.get("results")
+
+        yield from self.iterate_remaining_pages(this_request, first_page)
+
+    @staticmethod
+    def get_page_of_results(response):
+        """
+        Return the parsed data of a page of a paginated result
+
+        Parameters
+        ----------
+        response: requests.Response
+            response of a page request
+
+        Returns
+        -------
+        dict: page data
+        """
+
+        page = None
+        try:
+            page = response.json()
+        except (json.decoder.JSONDecodeError, RequestsJSONDecodeError):
+            pass
+
+        if response.status_code != 200 or not isinstance(page, dict) or page.get("results") is None:
+            log.error(f"NetBox returned: {response.request.method} {response.request.path_url} {response.reason}")
+            do_error_exit("Reading paginated data from NetBox failed.")
+
+        return page
+
+    def single_request(self, this_request, exit_on_failure=True):
         """
         Actually perform the request and retry x times if request times out.
         Program will exit if all retries failed!
@@ -324,10 +521,12 @@ class NetBoxHandler:
         ----------
         this_request: requests.session.prepare_request
             object of the prepared request
+        exit_on_failure: bool
+            if False, None is returned instead of exiting the program if all retries failed
 
         Returns
         -------
-        requests.Response: response for this request
+        requests.Response, None: response for this request, None if all retries failed
         """
 
         response = None
@@ -355,6 +554,10 @@ class NetBoxHandler:
             else:
                 break
         else:
+            if exit_on_failure is False:
+                log.warning(f"Giving up after {self.settings.max_retry_attempts} retries.")
+                return None
+
             do_error_exit(f"Giving up after {self.settings.max_retry_attempts} retries.")
 
         log.debug2("Received HTTP Status %s.", response.status_code)
@@ -402,50 +605,21 @@ class NetBoxHandler:
                 continue
 
             # initialize cache variables
-            cached_nb_data = list()
-            cache_file = f"{self.cache_directory}{os.sep}{nb_object_class.__name__}.cache"
-            cache_this_class = False
             latest_update = None
 
-            # check if cache file is accessible
+            # read data from cache
             if self.settings.use_caching is True:
-                cache_this_class = True
-
-                if os.path.exists(cache_file) and not os.access(cache_file, os.R_OK):
-                    log.warning(f"Got no permission to read existing cache file: {cache_file}")
-                    cache_this_class = False
-
-                if os.path.exists(cache_file) and not os.access(cache_file, os.W_OK):
-                    log.warning(f"Got no permission to write to existing cache file: {cache_file}")
-                    cache_this_class = False
 
-            # read data from cache file
-            if cache_this_class is True:
-                # noinspection PyBroadException
-                try:
-                    cached_nb_data = pickle.load(open(cache_file, "rb"))
-                except Exception:
-                    pass
-
-                if cached_nb_data is None:
-                    cached_nb_data = list()
-
-                # get date of latest update in cache file
-                if len(cached_nb_data) > 0:
-                    latest_update_list = \
-                        [x.get("last_updated") for x in cached_nb_data if x.get("last_updated") is not None]
+                latest_update = self.cache.get_latest_update(nb_object_class)
 
-                    if len(latest_update_list) > 0:
-                        latest_update = sorted(latest_update_list)[-1]
+                if latest_update is not None:
+                    log.debug(f"Found cached {nb_object_class.name}s, last updated '{latest_update}'")
 
-                        log.debug(f"Successfully read cached data with {len(cached_nb_data)} '{nb_object_class.name}%s'"
-                                  f", last updated '{latest_update}'" % plural(len(cached_nb_data)))
+            if self.testing_cache is True and latest_update is not None:
+                data_merge = NetBoxDataMerge(nb_object_class,
+                                             cached_objects=self.cache.iterate_objects(nb_object_class))
 
-                    elif self.testing_cache is False:
-                        cache_this_class = False
-
-            if self.testing_cache is True and len(cached_nb_data) > 0:
-                for object_data in cached_nb_data:
+                for object_data in data_merge:
                     self.inventory.add_object(nb_object_class, data=object_data, read_from_netbox=True)
 
                 # mark this object class as retrieved
@@ -453,76 +627,195 @@ class NetBoxHandler:
 
                 continue
 
-            full_nb_data = None
-            brief_nb_data = None
-            updated_nb_data = None
-
-            # no cache data found
+            # no cache data found, read a full set from NetBox
             if latest_update is None:
 
-                # get all objects of this class
+                # get all objects of this class, objects are added to the inventory page by page
                 log.debug(f"Requesting all {nb_object_class.name}s from NetBox")
-                full_nb_data = self.request(nb_object_class)
+                pages = self.request_pages(nb_object_class)
 
-                if full_nb_data.get("results") is None:
-                    log.error(f"Result data from NetBox for object {nb_object_class.__name__} missing!")
-                    do_error_exit("Reading data from NetBox failed.")
+                if self.settings.use_caching is True:
+                    pages = self.cache.write_pages(nb_object_class, pages, replace=True)
 
+                data_merge = NetBoxDataMerge(nb_object_class,
+                                             updated_objects=(x for page in pages for x in page))
+
+            # read the delta from NetBox and merge it with cached objects
             else:
 
-                # request a brief list of existing objects
-                log.debug(f"Requesting a brief list of {nb_object_class.name}s from NetBox")
-                brief_params = {"brief": 1, "limit": 500}
-                if version.parse(self.inventory.netbox_api_version) >= version.parse("4.0"):
-                    brief_params["fields"] = "id"
-                brief_nb_data = self.request(nb_object_class, params=brief_params)
-                log.debug("NetBox returned %d results." % len(brief_nb_data.get("results", list())))
+                deleted_ids = self.get_deleted_object_ids(nb_object_class, latest_update)
 
-                log.debug(f"Requesting the last updates since {latest_update} of {nb_object_class.name}s from NetBox")
-                updated_nb_data = self.request(nb_object_class, params={"last_updated__gte": latest_update})
-                log.debug("NetBox returned %d results." % len(updated_nb_data.get("results", list())))
+                # request a brief list of existing objects
+                if deleted_ids is None:
+                    log.debug(f"Requesting a brief list of {nb_object_class.name}s from NetBox")
+                    brief_params = {"brief": 1, "limit": 500}
+                    if version.parse(self.inventory.netbox_api_version) >= version.parse("4.0"):
+                        brief_params["fields"] = "id"
 
-                if brief_nb_data.get("results") is None or updated_nb_data.get("results") is None:
-                    log.error(f"Result data from NetBox for object {nb_object_class.__name__} missing!")
-                    do_error_exit("Reading data from NetBox failed.")
+                    existing_ids = {x.get("id") for page in self.request_pages(nb_object_class, params=brief_params)
+                                    for x in page}
+                    log.debug("NetBox returned %d results." % len(existing_ids))
 
-            # read a full set from NetBox
-            nb_objects = list()
-            if isinstance(full_nb_data, dict):
-                nb_objects = full_nb_data.get("results")
+                    self.cache.set_metadata(f"last_full_listing_{nb_object_class.__name__}",
+                                            datetime.now().timestamp())
 
-            elif self.testing_cache is True:
-                nb_objects = cached_nb_data
+                log.debug(f"Requesting the last updates since {latest_update} of {nb_object_class.name}s from NetBox")
+                updated_nb_data = [x for page in self.request_pages(nb_object_class,
+                                                                    params={"last_updated__gte": latest_update})
+                                   for x in page]
+                log.debug("NetBox returned %d results." % len(updated_nb_data))
 
-            # read the delta from NetBox and
-            else:
+                if deleted_ids is not None:
+                    existing_ids = self.cache.get_object_ids(nb_object_class).difference(deleted_ids)
+                    existing_ids.update({x.get("id") for x in updated_nb_data})
 
-                currently_existing_ids = [x.get("id") for x in brief_nb_data.get("results")]
-                changed_ids = [x.get("id") for x in updated_nb_data.get("results")]
+                data_merge = NetBoxDataMerge(nb_object_class,
+                                             cached_objects=self.cache.iterate_objects(nb_object_class),
+                                             existing_ids=existing_ids, updated_objects=updated_nb_data)
 
-                for this_object in cached_nb_data:
+            log.debug(f"Processing returned {nb_object_class.name}s")
 
-                    if this_object.get("id") in currently_existing_ids and this_object.get("id") not in changed_ids:
-                        nb_objects.append(this_object)
+            for object_data in data_merge:
+                self.inventory.add_object(nb_object_class, data=object_data, read_from_netbox=True)
 
-                nb_objects.extend(updated_nb_data.get("results"))
+            log.debug(f"Merged cached and current NetBox data: {data_merge}")
 
             if self.settings.use_caching is True:
-                try:
-                    pickle.dump(nb_objects, open(cache_file, "wb"))
-                    if cache_this_class is True:
-                        log.debug("Successfully cached %d objects." % (len(nb_objects)))
-                except Exception as e:
-                    log.warning(f"Failed to write NetBox data to cache file: {e}")
 
-            log.debug(f"Processing %s returned {nb_object_class.name}%s" % (len(nb_objects), plural(len(nb_objects))))
+                # full set of objects has been written while adding them to the inventory
+                if latest_update is None:
+                    self.cache.set_metadata(f"last_full_listing_{nb_object_class.__name__}",
+                                            datetime.now().timestamp())
 
-            for object_data in nb_objects:
-                self.inventory.add_object(nb_object_class, data=object_data, read_from_netbox=True)
+                # only write changes to cache
+                elif self.cache.update_objects(nb_object_class, data_merge.get_changed_objects(),
+                                               data_merge.removed_ids) is True:
+                    log.debug("Successfully cached %d objects." % data_merge.object_count)
 
             # mark this object class as retrieved
             self.resolved_dependencies.add(nb_object_class)
 
+    def request_object_changes(self, params, all_pages=True):
+        """
+        Request entries of the NetBox change log. In contrast to request() a failed request
+        will not stop the program as the change log is only used as an optimization.
+
+        Parameters
+        ----------
+        params: dict
+            dict of URL params which should be passed to NetBox
+        all_pages: bool
+            if False only the first page of results will be returned
+
+        Returns
+        -------
+        dict, None: returned change log data, None if request failed
+        """
+
+        api_path = "core/object-changes"
+        if version.parse(self.inventory.netbox_api_version) < version.parse("4.1"):
+            api_path = "extras/object-changes"
+
+        def get_page(page_request):
+
+            response = self.single_request(page_request, exit_on_failure=False)
+            if response is None:
+                log.warning("Unable to read NetBox change log")
+                return None
+
+            page = None
+            try:
+                page = response.json()
+            except (json.decoder.JSONDecodeError, RequestsJSONDecodeError):
+                pass
+
+            if response.status_code != 200 or not isinstance(page, dict) or page.get("results") is None:
+                log.warning(f"Unable to read NetBox change log: {response.status_code} {response.reason}")
+                return None
+
+            return page
+
+        this_request = self.session.prepare_request(
+                            requests.Request("GET", f"{self.url}{api_path}/", params=params)
+                       )
+
+        result = get_page(this_request)
+        if result is None:
+            return None
+
+        # remaining pages are requested one by one, a failed page fails the whole change log request
+        next_url = result.get("next") if all_pages is True else None
+        while next_url is not None:
+
+            next_request = this_request.copy()
+            next_request.url = next_url
+
+            page = get_page(next_request)
+            if page is None:
+                return None
+
+            result["results"].extend(page.get("results"))
+            next_url = page.get("next")
+
+        return result
+
+    def get_deleted_object_ids(self, object_class, latest_update):
+        """
+        Use the NetBox change log to find all objects of an object type which have been deleted since
+        the latest cached update. Returns None if a full list of existing objects needs to be requested
+        instead. This is the case if change log usage is disabled, the full listing interval has passed
+        or the change log doesn't reach back to the latest cached update anymore.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            object type to find deleted objects for
+        latest_update: str
+            latest 'last_updated' value of all cached objects of this type
+
+        Returns
+        -------
+        set, None: of deleted object IDs, None if a full listing is required
+        """
+
+        if self.settings.use_changelog_to_detect_deletions is False:
+            return None
+
+        try:
+            last_full_listing = float(self.cache.get_metadata(f"last_full_listing_{object_class.__name__}"))
+        except (TypeError, ValueError):
+            last_full_listing = None
+
+        full_listing_interval = self.settings.full_object_listing_interval_in_hours * 3600
+        if last_full_listing is None or datetime.now().timestamp() - last_full_listing > full_listing_interval:
+            log.debug(f"Full listing interval for {object_class.name}s passed")
+            return None
+
+        # if change log retention removed older entries, deletions since latest update might be missing
+        oldest_changes = self.request_object_changes({"time_before": latest_update, "limit": 1}, all_pages=False)
+        if oldest_changes is None:
+            return None
+
+        if oldest_changes.get("count", 0) == 0:
+            log.debug(f"NetBox change log doesn't reach back to latest {object_class.name} update {latest_update}")
+            return None
+
+        log.debug(f"Requesting deleted {object_class.name}s since {latest_update} from NetBox change log")
+        deleted_objects = self.request_object_changes({
+            "action": "delete",
+            "changed_object_type": object_class.get_content_type(),
+            "time_after": latest_update,
+            "limit": self.settings.default_netbox_result_limit
+        })
+        if deleted_objects is None:
+            return None
+
+        deleted_ids = {grab(x, "changed_object_id") for x in deleted_objects.get("results")}
+        log.debug(f"NetBox change log returned {len(deleted_ids)} deleted "
+                  f"{object_class.name}{plural(len(deleted_ids))}")
+
+        return deleted_ids
+
     def initialize_basic_data(self):
         """
         Adds the two basic tags to keep track of objects and see which
@@ -579,6 +872,9 @@ class NetBoxHandler:
         if version.parse(self.inventory.netbox_api_version) < version.parse(nb_object_sub_class.min_netbox_version):
             return
 
+        unset_requests = list()
+        objects_to_send = list()
+
         for this_object in self.inventory.get_all_items(nb_object_sub_class):
 
             # unset data if requested
@@ -599,11 +895,7 @@ class NetBoxHandler:
                 log.info("Updating NetBox '%s' object '%s' with data: %s" %
                          (this_object.name, this_object.get_display_name(), unset_data))
 
-                returned_object_data = self.request(nb_object_sub_class, req_type="PATCH",
-                                                    data=unset_data, nb_id=this_object.nb_id)
-
-                if returned_object_data is None:
-                    log.error(f"Request Failed for {nb_object_sub_class.name}. Used data: {unset_data}")
+                unset_requests.append((this_object, unset_data))
 
                 continue
 
@@ -613,84 +905,403 @@ class NetBoxHandler:
                     log.debug2("Resolving dependency: %s" % dependency.name)
                     self.update_object(dependency)
 
-            data_to_patch = dict()
-            unresolved_dependency_data = dict()
+            objects_to_send.append(this_object)
 
-            for key, value in this_object.data.items():
-                if key in this_object.updated_items:
+        if unset is True:
+            for this_object, returned_object_data in self.send_requests(nb_object_sub_class, "PATCH", unset_requests):
 
-                    if isinstance(value, (NetBoxObject, NBObjectList)):
+                if returned_object_data is None:
+                    log.error(f"Request Failed for {nb_object_sub_class.name}. "
+                              f"Used data: {dict(unset_requests).get(this_object)}")
 
-                        # resolve dependency issues in last run
-                        # primary IP always set in last run
-                        if value.get_nb_reference() is None or \
-                                (key.startswith("primary_ip") and last_run is False):
-                            unresolved_dependency_data[key] = value
-                        else:
-                            data_to_patch[key] = value.get_nb_reference()
+            return
 
-                    else:
-                        data_to_patch[key] = value
+        def references_any(referencing_object, referenced_objects):
+            for key in referencing_object.updated_items:
+                value = referencing_object.data.get(key)
+                if isinstance(value, NBObjectList):
+                    values = list(value)
+                elif isinstance(value, NetBoxObject):
+                    values = [value]
+                else:
+                    continue
+                if any(x is not referencing_object and x in referenced_objects for x in values):
+                    return True
+            return False
+
+        objects_to_delete = list()
+        while len(objects_to_send) > 0:
+
+            # objects which reference a new object of the same class (i.e. the parent interface) are sent
+            # once the referenced object has been created. If all objects reference each other, all are sent.
+            new_objects = set(x for x in objects_to_send if x.is_new is True)
+            deferred_objects = [x for x in objects_to_send if references_any(x, new_objects)]
+            if len(deferred_objects) == len(objects_to_send):
+                deferred_objects = list()
+
+            object_requests = list()
+            skipped_objects = set(deferred_objects)
+            for this_object in objects_to_send:
+                if this_object in skipped_objects:
+                    continue
 
-            # special case for IP address
-            if isinstance(this_object, NBIPAddress):
-                # if object is new and and has no id, then we need to remove assigned_object_type from data_to_patch
-                if "assigned_object_id" in unresolved_dependency_data.keys() and \
-                        "assigned_object_type" in data_to_patch.keys():
-                    del data_to_patch["assigned_object_type"]
+                data_to_patch, unresolved_dependency_data = self.get_object_data_to_send(this_object,
+                                                                                         last_run=last_run)
+                object_requests.append((this_object, data_to_patch, unresolved_dependency_data))
 
-            issued_request = False
-            returned_object_data = None
-            if len(data_to_patch.keys()) > 0:
+            # send all new objects and updates in bulk
+            returned_data = dict()
+            for req_type, is_new in [("POST", True), ("PATCH", False)]:
 
-                # default is a new object
-                nb_id = None
-                req_type = "POST"
-                action = "Creating new"
+                request_list = [(x, data) for x, data, _ in object_requests if len(data) > 0 and x.is_new is is_new]
 
-                # if its not a new object then update it
-                if this_object.is_new is False:
-                    nb_id = this_object.nb_id
-                    req_type = "PATCH"
-                    action = "Updating"
+                returned_data.update(dict(self.send_requests(nb_object_sub_class, req_type, request_list)))
 
-                log.info("%s NetBox '%s' object '%s' with data: %s" %
-                         (action, this_object.name, this_object.get_display_name(), data_to_patch))
+            for this_object, data_to_patch, unresolved_dependency_data in object_requests:
 
-                returned_object_data = self.request(nb_object_sub_class, req_type=req_type,
-                                                    data=data_to_patch, nb_id=nb_id)
+                self.process_returned_object_data(this_object, data_to_patch, unresolved_dependency_data,
+                                                  returned_data.get(this_object))
 
-                issued_request = True
+                if last_run is True and getattr(this_object, "deleted", False) is True:
+                    objects_to_delete.append((this_object, None))
 
-            if returned_object_data is not None:
+            objects_to_send = deferred_objects
 
-                this_object.update(data=returned_object_data, read_from_netbox=True)
+        self.send_requests(nb_object_sub_class, "DELETE", objects_to_delete)
 
-                this_object.resolve_relations()
+        # add class to resolved dependencies
+        self.resolved_dependencies.add(nb_object_sub_class)
 
-            elif issued_request is True:
-                log.error(f"Request Failed for {nb_object_sub_class.name}. Used data: {data_to_patch}")
+    @staticmethod
+    def get_object_data_to_send(this_object, last_run=False):
+        """
+        Compile the data of all updated items of an object which can be sent to NetBox.
+        References to objects which don't exist in NetBox yet can't be sent and are returned
+        separately. Primary IPs are only sent in the last run.
 
-            # add unresolved dependencies back to object
-            if len(unresolved_dependency_data.keys()) > 0:
-                log.debug2("Adding unresolved dependencies back to object: %s" %
-                           list(unresolved_dependency_data.keys()))
-                this_object.update(data=unresolved_dependency_data)
+        Parameters
+        ----------
+        this_object: NetBoxObject sub class
+            object to compile the data for
+        last_run: bool
+            True if this will be the last update run. Needed to assign primary_ip4/6 properly
+
+        Returns
+        -------
+        tuple: data to send to NetBox and data with unresolved dependencies
+        """
+
+        data_to_patch = dict()
+        unresolved_dependency_data = dict()
+
+        for key, value in this_object.data.items():
+            if key in this_object.updated_items:
+
+                if isinstance(value, (NetBoxObject, NBObjectList)):
+
+                    # resolve dependency issues in last run
+                    # primary IP always set in last run
+                    if value.get_nb_reference() is None or \
+                            (key.startswith("primary_ip") and last_run is False):
+                        unresolved_dependency_data[key] = value
+                    else:
+                        data_to_patch[key] = value.get_nb_reference()
+
+                else:
+                    data_to_patch[key] = value
+
+        # special case for IP address
+        if isinstance(this_object, NBIPAddress):
+            # if object is new and and has no id, then we need to remove assigned_object_type from data_to_patch
+            if "assigned_object_id" in unresolved_dependency_data.keys() and \
+                    "assigned_object_type" in data_to_patch.keys():
+                del data_to_patch["assigned_object_type"]
+
+        if len(data_to_patch.keys()) > 0:
+
+            action = "Creating new" if this_object.is_new is True else "Updating"
+
+            log.info("%s NetBox '%s' object '%s' with data: %s" %
+                     (action, this_object.name, this_object.get_display_name(), data_to_patch))
+
+        return data_to_patch, unresolved_dependency_data
+
+    @staticmethod
+    def process_returned_object_data(this_object, data_to_patch, unresolved_dependency_data, returned_object_data):
+        """
+        Update an object with the data NetBox returned after the object has been sent to NetBox
+        and add all unresolved dependencies back to the object.
+
+        Parameters
+        ----------
+        this_object: NetBoxObject sub class
+            object which has been sent to NetBox
+        data_to_patch: dict
+            data which has been sent to NetBox
+        unresolved_dependency_data: dict
+            data which couldn't be sent to NetBox due to unresolved dependencies
+        returned_object_data: dict, None
+            data returned from NetBox, None if request failed
+        """
+
+        if returned_object_data is not None:
+
+            this_object.update(data=returned_object_data, read_from_netbox=True)
 
             this_object.resolve_relations()
 
-            if last_run is True and getattr(this_object, "deleted", False) is True:
-                self.request(nb_object_sub_class, req_type="DELETE", nb_id=this_object.nb_id)
+        elif len(data_to_patch.keys()) > 0:
+            log.error(f"Request Failed for {this_object.name}. Used data: {data_to_patch}")
 
-        # add class to resolved dependencies
-        self.resolved_dependencies.add(nb_object_sub_class)
+        # add unresolved dependencies back to object
+        if len(unresolved_dependency_data.keys()) > 0:
+            log.debug2("Adding unresolved dependencies back to object: %s" %
+                       list(unresolved_dependency_data.keys()))
+            this_object.update(data=unresolved_dependency_data)
+
+        this_object.resolve_relations()
+
+    def update_objects_by_dependency(self):
+        """
+        Add/Update all objects with pending changes in order of their dependencies.
+
+        All objects with updated items form a dependency graph. An object depends on every new
+        object it references which also has to be created in NetBox and on every pending custom
+        field it sets a value for. Objects without dependencies
+        to each other are sent in parallel using up to 'max_parallel_requests' threads. Objects of
+        the same type are combined into bulk requests. Once the NetBox ID of an object is known,
+        all objects which depend on it are sent.
+
+        Primary IPs and references which can't be resolved are added back to the objects
+        and have to be sent in a last run.
+        """
+
+        pending_objects = list()
+        for nb_object_sub_class in NetBoxObject.__subclasses__():
+
+            # make sure to update only available object types
+            if version.parse(self.inventory.netbox_api_version) < \
+                    version.parse(nb_object_sub_class.min_netbox_version):
+                continue
+
+            for this_object in self.inventory.get_all_items(nb_object_sub_class):
+                if len(this_object.updated_items) > 0:
+                    pending_objects.append(this_object)
+
+        # object -> set of objects it waits for
+        waiting_for = {x: set() for x in pending_objects}
+        # object -> list of objects which wait for it
+        dependent_objects = dict()
+
+        # custom fields are referenced by name. New custom fields and changed object types
+        # have to be sent before any object uses the custom field.
+        pending_custom_fields = {x.data.get("name"): x for x in pending_objects if isinstance(x, NBCustomField)}
+
+        for this_object in pending_objects:
+            for key in this_object.updated_items:
+
+                if key.startswith("primary_ip"):
+                    continue
+
+                value = this_object.data.get(key)
+
+                if key == "custom_fields" and isinstance(value, dict):
+                    referenced_objects = [pending_custom_fields[x] for x in value if x in pending_custom_fields]
+                elif isinstance(value, NBObjectList):
+                    referenced_objects = list(value)
+                elif isinstance(value, NetBoxObject):
+                    referenced_objects = [value]
+                else:
+                    continue
+
+                for referenced_object in referenced_objects:
+                    if referenced_object is this_object or referenced_object not in waiting_for:
+                        continue
+
+                    if referenced_object.nb_id != 0 and not isinstance(referenced_object, NBCustomField):
+                        continue
+
+                    waiting_for[this_object].add(referenced_object)
+                    dependent_objects.setdefault(referenced_object, list()).append(this_object)
+
+        log.debug(f"Found {len(pending_objects)} object{plural(len(pending_objects))} with pending changes")
+
+        finished_objects = set()
+        requested_objects = dict()
+        ready_objects = deque(x for x in pending_objects if len(waiting_for[x]) == 0)
+
+        def finish_object(finished_object):
+            finished_objects.add(finished_object)
+            for dependent_object in dependent_objects.get(finished_object, list()):
+                waiting_for[dependent_object].discard(finished_object)
+                if len(waiting_for[dependent_object]) == 0:
+                    ready_objects.append(dependent_object)
+
+        with ThreadPoolExecutor(max_workers=self.settings.max_parallel_requests) as executor:
+
+            running_requests = set()
+            while True:
+
+                # group all objects which are ready to be sent by type and request type
+                request_groups = dict()
+                while len(ready_objects) > 0:
+                    this_object = ready_objects.popleft()
+
+                    if this_object in finished_objects or this_object in requested_objects:
+                        continue
+
+                    data_to_patch, unresolved_dependency_data = self.get_object_data_to_send(this_object)
+                    requested_objects[this_object] = (data_to_patch, unresolved_dependency_data)
+
+                    if len(data_to_patch.keys()) == 0:
+                        self.process_returned_object_data(this_object, data_to_patch, unresolved_dependency_data,
+                                                          None)
+                        finish_object(this_object)
+                        continue
+
+                    req_type = "POST" if this_object.is_new is True else "PATCH"
+                    request_groups.setdefault((type(this_object), req_type), list()).append(
+                        (this_object, data_to_patch)
+                    )
+
+                for (object_class, req_type), request_list in request_groups.items():
+                    running_requests.add(executor.submit(self.send_requests, object_class, req_type, request_list))
+
+                if len(running_requests) == 0:
+
+                    # break possible circular dependencies, unresolved references will be sent in last run
+                    unfinished_objects = [x for x in pending_objects if x not in requested_objects]
+                    if len(unfinished_objects) == 0:
+                        break
+
+                    log.debug2(f"Unable to resolve all dependencies for {unfinished_objects[0].name} "
+                               f"'{unfinished_objects[0].get_display_name()}'")
+                    ready_objects.append(unfinished_objects[0])
+                    continue
+
+                done_requests, running_requests = wait(running_requests, return_when=FIRST_COMPLETED)
+
+                for done_request in done_requests:
+                    for this_object, returned_object_data in done_request.result():
+                        data_to_patch, unresolved_dependency_data = requested_objects.get(this_object)
+
+                        self.process_returned_object_data(this_object, data_to_patch, unresolved_dependency_data,
+                                                          returned_object_data)
+                        finish_object(this_object)
+
+    def send_requests(self, object_class, req_type, request_list):
+        """
+        Send POST, PATCH or DELETE requests for a list of objects of the same object class.
+        Requests are combined into bulk requests of up to 'bulk_request_chunk_size' objects
+        using the list endpoint of this object class. If a bulk request fails, each object of
+        this chunk is sent with a separate request. This way a single invalid object doesn't
+        prevent all other objects from being updated.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            class definition of the NetBox objects
+        req_type: str
+            POST, PATCH, DELETE
+        request_list: list
+            list of tuples of the NetBoxObject and the data which shall be sent for this object
+
+        Returns
+        -------
+        list: of tuples of the NetBoxObject and returned data of this object. None if request failed
+        """
+
+        results = list()
+
+        if len(request_list) == 0:
+            return results
+
+        chunk_size = self.settings.bulk_request_chunk_size
+
+        # bulk update and delete is available since NetBox 2.10
+        if req_type != "POST" and version.parse(self.inventory.netbox_api_version) < version.parse("2.10"):
+            chunk_size = 1
+
+        for chunk_start in range(0, len(request_list), chunk_size):
+
+            chunk = request_list[chunk_start:chunk_start + chunk_size]
+
+            chunk_results = None
+            if len(chunk) > 1:
+                chunk_results = self.bulk_request(object_class, req_type, chunk)
+
+            if chunk_results is None:
+                chunk_results = list()
+                for this_object, data in chunk:
+
+                    nb_id = None
+                    if req_type != "POST":
+                        nb_id = this_object.nb_id
+
+                    chunk_results.append(
+                        (this_object, self.request(object_class, req_type=req_type, data=data, nb_id=nb_id))
+                    )
+
+            results.extend(chunk_results)
+
+        return results
+
+    def bulk_request(self, object_class, req_type, chunk):
+        """
+        Send a single bulk request for a list of objects of the same object class.
+
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            class definition of the NetBox objects
+        req_type: str
+            POST, PATCH, DELETE
+        chunk: list
+            list of tuples of the NetBoxObject and the data which shall be sent for this object
+
+        Returns
+        -------
+        (list, None): of tuples of the NetBoxObject and returned data of this object. None if bulk request failed
+        """
+
+        if req_type == "POST":
+            bulk_data = [data for _, data in chunk]
+        elif req_type == "PATCH":
+            bulk_data = [{**data, "id": this_object.nb_id} for this_object, data in chunk]
+        else:
+            bulk_data = [{"id": this_object.nb_id} for this_object, _ in chunk]
+
+        log.debug2(f"Sending bulk {req_type} request for {len(chunk)} {object_class.name} objects")
+
+        result = self.request(object_class, req_type=req_type, data=bulk_data)
+
+        if result is True and req_type == "DELETE":
+            return [(this_object, True) for this_object, _ in chunk]
+
+        if isinstance(result, list) and len(result) == len(chunk):
+
+            # created objects are returned in the same order as they were sent
+            if req_type == "POST":
+                return [(this_object, returned_data) for (this_object, _), returned_data in zip(chunk, result)]
+
+            returned_data_by_id = {x.get("id"): x for x in result if isinstance(x, dict)}
+
+            return [(this_object, returned_data_by_id.get(this_object.nb_id)) for this_object, _ in chunk]
+
+        if req_type == "POST" and result is not None:
+            do_error_exit(f"Unable to match objects returned by bulk request for {object_class.name} objects")
+
+        log.warning(f"Bulk {req_type} request for {len(chunk)} {object_class.name} objects failed. "
+                    f"Sending a request for each object.")
+
+        return None
 
     def update_instance(self):
         """
         Add/Update all items in local inventory to NetBox in three runs.
 
         1. update all objects with "unset_attributes"
-        2. regular run to add update objects
+        2. add/update objects in order of their dependencies, independent objects in parallel
         3. update all objects with unresolved dependencies in previous runs
 
         At the end check if any unresolved dependencies are still left
@@ -705,10 +1316,8 @@ class NetBoxHandler:
             self.update_object(nb_object_sub_class, unset=True)
 
         # update all items
-        log.debug("Second run, update all items")
-        self.resolved_dependencies = set()
-        for nb_object_sub_class in NetBoxObject.__subclasses__():
-            self.update_object(nb_object_sub_class)
+        log.debug("Second run, update all items in order of their dependencies")
+        self.update_objects_by_dependency()
 
         # run again to updated objects with previous unresolved dependencies
         log.debug("Third run, update all items with previous unresolved items")
@@ -749,6 +1358,9 @@ class NetBoxHandler:
             if getattr(nb_object_sub_class, "prune", False) is False:
                 continue
 
+            objects_to_delete = list()
+            interfaces_to_delete = dict()
+
             for this_object in self.inventory.get_all_items(nb_object_sub_class):
 
                 if this_object.source is not None:
@@ -807,16 +1419,21 @@ class NetBoxHandler:
 
                             log.info(f"Deleting interface '{object_interface.get_display_name()}'")
 
-                            ret = self.request(object_interface.__class__, req_type="DELETE",
-                                               nb_id=object_interface.nb_id)
-
-                            if ret is True:
-                                object_interface.deleted = True
+                            interfaces_to_delete.setdefault(object_interface.__class__, list()).append(
+                                (object_interface, None)
+                            )
 
-                    ret = self.request(nb_object_sub_class, req_type="DELETE", nb_id=this_object.nb_id)
+                    objects_to_delete.append((this_object, None))
 
+            # delete device/VM interfaces first
+            for interface_class, interface_list in interfaces_to_delete.items():
+                for object_interface, ret in self.send_requests(interface_class, "DELETE", interface_list):
                     if ret is True:
-                        this_object.deleted = True
+                        object_interface.deleted = True
+
+            for this_object, ret in self.send_requests(nb_object_sub_class, "DELETE", objects_to_delete):
+                if ret is True:
+                    this_object.deleted = True
 
         return
 
@@ -850,6 +1467,7 @@ class NetBoxHandler:
                 if nb_object_sub_class == NBTag:
                     continue
 
+                objects_to_delete = list()
                 for this_object in self.inventory.get_all_items(nb_object_sub_class):
 
                     # already deleted
@@ -861,10 +1479,11 @@ class NetBoxHandler:
                     if self.primary_tag in this_object.get_tags():
                         log.info(f"{nb_object_sub_class.name} '{this_object.get_display_name()}' will be deleted now")
 
-                        result = self.request(nb_object_sub_class, req_type="DELETE", nb_id=this_object.nb_id)
+                        objects_to_delete.append((this_object, None))
 
-                        if result is not None:
-                            this_object.deleted = True
+                for this_object, result in self.send_requests(nb_object_sub_class, "DELETE", objects_to_delete):
+                    if result is not None:
+                        this_object.deleted = True
 
             if found_objects_to_delete is False:
 
@@ -894,6 +1513,7 @@ class NetBoxHandler:
 
         self.query_current_data([NBTag])
 
+        tags_to_delete = list()
         for this_tag in self.inventory.get_all_items(NBTag):
 
             tag_description = grab(this_tag, "data.description")
@@ -906,6 +1526,8 @@ class NetBoxHandler:
                 continue
 
             log.info(f"Deleting unused tag '{this_tag.get_display_name()}'")
-            self.request(NBTag, req_type="DELETE", nb_id=this_tag.nb_id)
+            tags_to_delete.append((this_tag, None))
+
+        self.send_requests(NBTag, "DELETE", tags_to_delete)
 
 # EOF
@@ -10,9 +10,10 @@
 import json
 
 from module.netbox import *
+from module.netbox.prefix_lookup import NetBoxPrefixLookup
 from module.common.misc import grab
 from module.common.logging import get_logger
-from module.common.support import perform_ptr_lookups
+from module.common.support import perform_ptr_lookups, normalize_mac_address
 
 log = get_logger()
 
@@ -24,11 +25,58 @@ class NetBoxInventory:
 
     base_structure = dict()
 
+    # per object type indexes used to find objects by id or name
+    object_index = dict()
+
+    # holds the insertion sequence and the index keys of every indexed object
+    indexed_objects = dict()
+
+    # object types whose name index needs to be rebuilt before next use
+    dirty_name_indexes = set()
+
+    # object type name -> names of object types which use it as part of their display name
+    name_index_dependencies = dict()
+
+    # attributes of object types which reference a parent object, used to find all children of a parent
+    relation_indexes = {
+        NBVMInterface: ["virtual_machine"],
+        NBInterface: ["device"],
+        NBVirtualDisk: ["virtual_machine"],
+        NBIPAddress: ["assigned_object_id"],
+        NBPrefix: ["site"],
+        NBDevice: ["primary_ip4", "primary_ip6"],
+        NBVM: ["primary_ip4", "primary_ip6"]
+    }
+
+    # relation attributes which are only indexed if they reference an object. Most objects don't
+    # reference anything with these attributes, which would make their 'no_relation' bucket huge.
+    sparse_relation_indexes = ["primary_ip4", "primary_ip6"]
+
+    # index key for objects without a parent object
+    no_relation = object()
+
+    # attributes of object types which are indexed by their values. Used by get_by_data to find objects
+    # by attributes which are neither ID nor primary key without checking every object of this type.
+    # Objects are only indexed if all attributes of an index are defined.
+    attribute_indexes = {
+        NBDevice: [("serial",), ("asset_tag",)],
+        NBVLAN: [("vid", "site")]
+    }
+
+    # longest prefix match lookup of NBPrefix objects per site index key, built on first use and
+    # dropped every time a prefix of this site is added, changed or removed
+    prefix_lookups = dict()
+
+    object_sequence = 0
+
     source_list = list()
 
     # track NetBox API version and provided it for all sources
     netbox_api_version = "0.0.0"
 
+    # NetBox cache directory, provided for sources to persist their own state. None if caching is disabled
+    cache_directory = None
+
     def __new__(cls):
         it = cls.__dict__.get("__it__")
         if it is not None:
@@ -42,6 +90,28 @@ class NetBoxInventory:
         for object_type in NetBoxObject.__subclasses__():
 
             self.base_structure[object_type.name] = list()
+            self.object_index[object_type.name] = {
+                "id": dict(),
+                "name": dict()
+            }
+
+            # IP address objects are also indexed by IP address without prefix length
+            if object_type == NBIPAddress:
+                self.object_index[object_type.name]["ip"] = dict()
+
+            # interfaces are also indexed by their normalized MAC address
+            if object_type in [NBInterface, NBVMInterface]:
+                self.object_index[object_type.name]["mac"] = dict()
+
+            # VLANs without a site are also indexed by VLAN ID
+            if object_type == NBVLAN:
+                self.object_index[object_type.name]["global_vid"] = dict()
+
+            for attribute in self.relation_indexes.get(object_type, list()):
+                self.object_index[object_type.name][attribute] = dict()
+
+            for attributes in self.attribute_indexes.get(object_type, list()):
+                self.object_index[object_type.name][attributes] = dict()
 
     def add_source(self, source_handler=None):
         """
@@ -79,10 +149,16 @@ class NetBoxInventory:
         if nb_id is None or self.base_structure[object_type.name] is None:
             return None
 
-        for this_object in self.base_structure[object_type.name]:
+        # new objects are not indexed by ID
+        if nb_id == 0:
+            for this_object in self.base_structure[object_type.name]:
+
+                if this_object.nb_id == nb_id:
+                    return this_object
+
+            return None
 
-            if this_object.nb_id == nb_id:
-                return this_object
+        return self.get_from_index(object_type, "id", nb_id)
 
     def get_by_data(self, object_type, data=None):
         """
@@ -115,31 +191,24 @@ class NetBoxInventory:
         if data_id is not None and data_id != 0:
             return self.get_by_id(object_type, nb_id=data_id)
 
-        # try to find object by slug
-        if "slug" in object_type.data_model.keys() and data.get("name") is not None:
-            object_slug = NetBoxObject.format_slug(data.get("name"))
-            for this_object in self.get_all_items(object_type):
-                if this_object.data.get("slug") == object_slug:
-                    return this_object
-
         # try to find by primary/secondary key
-        elif data.get(object_type.primary_key) is not None:
-            object_name_to_find = None
-            for this_object in self.get_all_items(object_type):
+        if data.get(object_type.primary_key) is not None:
 
-                if object_name_to_find is None:
-                    object_name_to_find = this_object.get_display_name(data, including_second_key=True)
+            # use any object instance of this type to format the name to find
+            object_name_to_find = \
+                self.get_all_items(object_type)[0].get_display_name(data, including_second_key=True)
 
-                # compare lower key
-                if f"{object_name_to_find}".lower() == \
-                        f"{this_object.get_display_name(including_second_key=True)}".lower():
-
-                    return this_object
+            # compare lower key
+            return self.get_from_index(object_type, "name", f"{object_name_to_find}".lower())
 
         # try to match all data attributes
         else:
 
-            for this_object in self.get_all_items(object_type):
+            objects_to_check = self.get_attribute_index_candidates(object_type, data)
+            if objects_to_check is None:
+                objects_to_check = self.get_all_items(object_type)
+
+            for this_object in objects_to_check:
                 all_items_match = True
                 for attr_name, attr_value in data.items():
 
@@ -177,12 +246,29 @@ class NetBoxInventory:
 
         # add to inventory
         self.base_structure[object_type.name].append(new_object)
+        self.add_object_to_index(new_object, read_from_netbox=read_from_netbox)
 
         if read_from_netbox is False:
             log.info(f"Created new {new_object.name} object: {new_object.get_display_name()}")
 
         return new_object
 
+    def remove_object(self, this_object):
+        """
+        Removes an object from the inventory and all indexes.
+
+        Parameters
+        ----------
+        this_object: NetBoxObject sub class
+            object instance to remove
+        """
+
+        if this_object not in self.indexed_objects:
+            return
+
+        self.remove_object_from_index(this_object)
+        self.base_structure[this_object.name].remove(this_object)
+
     def add_update_object(self, object_type, data=None, read_from_netbox=False, source=None):
         """
         Adds new object or updates existing object with data, based on the content of data.
@@ -232,6 +318,504 @@ class NetBoxInventory:
 
         log.debug("Finished resolving relations")
 
+    def get_object_index_keys(self, this_object):
+        """
+        Return the keys used to index an object.
+
+        The name key is only determined if the name index of this object type is in use. Otherwise,
+        the name index gets built on first use.
+
+        Relation keys are the referenced parent objects. Unresolved relations are not indexed.
+
+        Attribute index keys are the values of the indexed attributes.
+
+        Parameters
+        ----------
+        this_object: NetBoxObject sub class
+            object instance to return the index keys for
+
+        Returns
+        -------
+        dict: of index names and the key of this object in that index (None if not indexed)
+        """
+
+        nb_id = this_object.nb_id
+        if nb_id == 0:
+            nb_id = None
+
+        name = None
+        if this_object.name not in self.dirty_name_indexes:
+            name = f"{this_object.get_display_name(including_second_key=True)}".lower()
+
+        index_keys = {
+            "id": nb_id,
+            "name": name
+        }
+
+        for attribute in self.relation_indexes.get(type(this_object), list()):
+            related_object = this_object.data.get(attribute)
+
+            if related_object is None and attribute not in self.sparse_relation_indexes:
+                related_object = self.no_relation
+            elif not isinstance(related_object, NetBoxObject):
+                related_object = None
+
+            index_keys[attribute] = related_object
+
+        if isinstance(this_object, NBIPAddress):
+            index_keys["ip"] = self.get_ip_index_key(this_object.data.get("address"))
+
+        elif isinstance(this_object, (NBInterface, NBVMInterface)):
+            index_keys["mac"] = normalize_mac_address(this_object.data.get("mac_address"))
+
+        elif isinstance(this_object, NBVLAN):
+            index_keys["global_vid"] = this_object.data.get("vid") if this_object.data.get("site") is None else None
+
+        for attributes in self.attribute_indexes.get(type(this_object), list()):
+            index_keys[attributes] = self.get_attribute_index_key(this_object.data, attributes)
+
+        return index_keys
+
+    @staticmethod
+    def get_attribute_index_key(data, attributes):
+        """
+        Return the key of an object in an attribute index
+
+        Parameters
+        ----------
+        data: dict
+            object data
+        attributes: tuple
+            indexed attributes
+
+        Returns
+        -------
+        tuple, None: the values of all attributes, None if an attribute is undefined or can't be indexed
+        """
+
+        key = tuple(data.get(x) for x in attributes)
+
+        if None in key:
+            return None
+
+        # unresolved relations are not indexed
+        try:
+            hash(key)
+        except TypeError:
+            return None
+
+        return key
+
+    def get_attribute_index_candidates(self, object_type, data):
+        """
+        Return all objects of $object_type which match the values of $data for the attributes of an
+        attribute index. The remaining attributes of $data still need to be compared.
+
+        Parameters
+        ----------
+        object_type: NetBoxObject sub class
+            object type to find
+        data: dict
+            params of object to match
+
+        Returns
+        -------
+        list, None: candidates in inventory order, None if no attribute index covers the data
+        """
+
+        for attributes in self.attribute_indexes.get(object_type, list()):
+
+            if not all(x in data for x in attributes):
+                continue
+
+            key = self.get_attribute_index_key(data, attributes)
+            if key is None:
+                continue
+
+            return list(self.object_index[object_type.name][attributes].get(key, list()))
+
+        return None
+
+    @staticmethod
+    def get_ip_index_key(address):
+        """
+        Return the key of an IP address in the IP address index
+
+        Parameters
+        ----------
+        address: str, IPv4Interface, IPv6Interface
+            IP address with or without prefix length
+
+        Returns
+        -------
+        str, None: the IP address without prefix length
+        """
+
+        if address is None:
+            return None
+
+        return f"{address}".split("/")[0]
+
+    def _add_to_index_bucket(self, this_object, index_name, key, sequence):
+
+        if key is None:
+            return
+
+        if index_name == "site" and isinstance(this_object, NBPrefix):
+            self.prefix_lookups.pop(key, None)
+
+        index = self.object_index[this_object.name][index_name]
+
+        bucket = index.get(key)
+        if bucket is None:
+            index[key] = [this_object]
+            return
+
+        # keep bucket in order of insertion to the inventory, first object wins on lookups
+        position = len(bucket)
+        while position > 0 and self.indexed_objects[bucket[position - 1]][0] > sequence:
+            position -= 1
+
+        bucket.insert(position, this_object)
+
+    def _remove_from_index_bucket(self, this_object, index_name, key):
+
+        if key is None:
+            return
+
+        if index_name == "site" and isinstance(this_object, NBPrefix):
+            self.prefix_lookups.pop(key, None)
+
+        index = self.object_index[this_object.name][index_name]
+
+        bucket = index.get(key)
+        if bucket is None or this_object not in bucket:
+            return
+
+        bucket.remove(this_object)
+        if len(bucket) == 0:
+            del index[key]
+
+    def add_object_to_index(self, this_object, read_from_netbox=False):
+        """
+        Add an object to the id and name index of its object type.
+
+        Parameters
+        ----------
+        this_object: NetBoxObject sub class
+            object instance to add to the indexes
+        read_from_netbox: bool
+            True if object was read directly from NetBox
+        """
+
+        object_type = type(this_object)
+
+        # register object types which use this object in their display name
+        if self.name_index_dependencies.get(object_type.name) is None:
+            self.name_index_dependencies[object_type.name] = set()
+
+            if getattr(object_type, "secondary_key", None) is not None:
+                for data_type in this_object.data_model.values():
+                    if data_type in NetBoxObject.__subclasses__():
+                        self.name_index_dependencies.setdefault(data_type.name, set()).add(object_type.name)
+
+        # relations of objects read from NetBox are not resolved yet, build name index on first use
+        if read_from_netbox is True:
+            self.dirty_name_indexes.add(object_type.name)
+
+        self.object_sequence += 1
+        index_keys = self.get_object_index_keys(this_object)
+
+        self.indexed_objects[this_object] = (self.object_sequence, index_keys)
+
+        for index_name, key in index_keys.items():
+            self._add_to_index_bucket(this_object, index_name, key, self.object_sequence)
+
+    def remove_object_from_index(self, this_object):
+        """
+        Remove an object from all indexes.
+
+        Parameters
+        ----------
+        this_object: NetBoxObject sub class
+            object instance to remove from the indexes
+        """
+
+        sequence, index_keys = self.indexed_objects.pop(this_object, (None, dict()))
+
+        for index_name, key in index_keys.items():
+            self._remove_from_index_bucket(this_object, index_name, key)
+
+    def update_object_index(self, this_object, read_from_netbox=False):
+        """
+        Update index entries of an object after its data changed. Needs to be called every time
+        the NetBox ID, display name or a relation of an object could have changed.
+
+        Parameters
+        ----------
+        this_object: NetBoxObject sub class
+            object instance to update the index for
+        read_from_netbox: bool
+            True if object data was just read from NetBox. Name and relations get updated
+            once relations of this object have been resolved.
+        """
+
+        index_data = self.indexed_objects.get(this_object)
+
+        # object not part of inventory yet
+        if index_data is None:
+            return
+
+        sequence, current_index_keys = index_data
+
+        # the prefix itself could have changed
+        if isinstance(this_object, NBPrefix):
+            self.prefix_lookups.pop(current_index_keys.get("site"), None)
+
+        new_index_keys = self.get_object_index_keys(this_object)
+
+        if read_from_netbox is True:
+            for index_name in ["name", *self.relation_indexes.get(type(this_object), list())]:
+                new_index_keys[index_name] = current_index_keys.get(index_name)
+
+        if new_index_keys == current_index_keys:
+            return
+
+        for index_name, key in new_index_keys.items():
+            if current_index_keys.get(index_name) == key:
+                continue
+
+            self._remove_from_index_bucket(this_object, index_name, current_index_keys.get(index_name))
+            self._add_to_index_bucket(this_object, index_name, key, sequence)
+
+        self.indexed_objects[this_object] = (sequence, new_index_keys)
+
+        if new_index_keys.get("name") is not None and current_index_keys.get("name") != new_index_keys.get("name"):
+            self.mark_dependent_name_indexes_dirty(type(this_object))
+
+    def mark_dependent_name_indexes_dirty(self, object_type):
+        """
+        The display name of an object can contain the display name of a related object (i.e. interface and device).
+        If the display name of an object changed then the name index of all object types which depend on
+        this type will be rebuilt on next lookup.
+
+        Parameters
+        ----------
+        object_type: NetBoxObject sub class
+            object type which display name changed
+        """
+
+        types_to_check = [object_type.name]
+        while len(types_to_check) > 0:
+            for dependent_type_name in self.name_index_dependencies.get(types_to_check.pop(), set()):
+                if dependent_type_name in self.dirty_name_indexes:
+                    continue
+
+                self.dirty_name_indexes.add(dependent_type_name)
+                types_to_check.append(dependent_type_name)
+
+    def rebuild_name_index(self, object_type):
+        """
+        Rebuild the name index of an object type.
+
+        Parameters
+        ----------
+        object_type: NetBoxObject sub class
+            object type to rebuild the name index for
+        """
+
+        log.debug3(f"Rebuilding name index for '{object_type.name}' objects")
+
+        self.dirty_name_indexes.discard(object_type.name)
+        self.object_index[object_type.name]["name"] = dict()
+
+        for this_object in self.base_structure[object_type.name]:
+            sequence, index_keys = self.indexed_objects[this_object]
+
+            index_keys["name"] = self.get_object_index_keys(this_object).get("name")
+            self._add_to_index_bucket(this_object, "name", index_keys["name"], sequence)
+
+    def get_from_index(self, object_type, index_name, key):
+        """
+        Return first object of $object_type found in index $index_name with $key
+
+        Parameters
+        ----------
+        object_type: NetBoxObject sub class
+            object type to find
+        index_name: str
+            name of the index to use ("id" or "name")
+        key: (int, str)
+            the key to find
+
+        Returns
+        -------
+        (NetBoxObject sub class, None): return object instance if object was found, None otherwise
+        """
+
+        if index_name == "name" and object_type.name in self.dirty_name_indexes:
+            self.rebuild_name_index(object_type)
+
+        bucket = self.object_index[object_type.name][index_name].get(key)
+
+        if bucket is None or len(bucket) == 0:
+            return None
+
+        return bucket[0]
+
+    def get_related_objects(self, object_type, attribute, related_object):
+        """
+        Return all objects of $object_type which reference $related_object with $attribute.
+        Only attributes defined in 'relation_indexes' can be used.
+
+        Parameters
+        ----------
+        object_type: NetBoxObject sub class
+            object type to find
+        attribute: str
+            name of the attribute which references the related object
+        related_object: NetBoxObject sub class, None
+            the referenced object or None to find all objects without a reference
+
+        Returns
+        -------
+        list: of all $object_type items which reference $related_object
+        """
+
+        if attribute not in self.relation_indexes.get(object_type, list()):
+            raise ValueError(f"Attribute '{attribute}' of '{object_type.name}' objects is not indexed.")
+
+        if related_object is None:
+            related_object = self.no_relation
+
+        return list(self.object_index[object_type.name][attribute].get(related_object, list()))
+
+    def get_objects_by_primary_ip(self, object_type, primary_ip4=None, primary_ip6=None):
+        """
+        Return all $object_type objects which use an IP address object with $primary_ip4 as primary IPv4
+        or $primary_ip6 as primary IPv6 address
+
+        Parameters
+        ----------
+        object_type: NBDevice, NBVM
+            object type to find
+        primary_ip4: str
+            IPv4 address with or without prefix length
+        primary_ip6: str
+            IPv6 address with or without prefix length
+
+        Returns
+        -------
+        list: of tuples with the object and the IP version of the matching primary IP. Objects are
+              returned in inventory order, an object matching both addresses is returned with IPv4 first.
+        """
+
+        objects_found = dict()
+
+        for ip_version, address in [(4, primary_ip4), (6, primary_ip6)]:
+
+            if address is None:
+                continue
+
+            for ip_object in self.object_index[NBIPAddress.name]["ip"].get(self.get_ip_index_key(address), list()):
+                for this_object in self.get_related_objects(object_type, f"primary_ip{ip_version}", ip_object):
+                    objects_found.setdefault((this_object, ip_version), self.indexed_objects[this_object][0])
+
+        return sorted(objects_found, key=lambda x: (objects_found[x], x[1]))
+
+    def count_matching_macs(self, object_type, mac_list):
+        """
+        Find all $object_type objects which have an interface with a MAC address of $mac_list
+        and count the matching interfaces of each object.
+
+        Parameters
+        ----------
+        object_type: NBDevice, NBVM
+            object type to find
+        mac_list: list
+            list of MAC addresses to compare against NetBox interface objects
+
+        Returns
+        -------
+        dict: number of interfaces with a matching MAC address by NBDevice/NBVM object
+        """
+
+        interface_type = NBInterface if object_type == NBDevice else NBVMInterface
+        interface_index = self.object_index[interface_type.name]["mac"]
+
+        objects_with_matching_macs = dict()
+
+        for mac_address in {normalize_mac_address(x) for x in mac_list if x is not None}:
+
+            for interface in interface_index.get(mac_address, list()):
+
+                matching_object = interface.data.get(interface.secondary_key)
+                if not isinstance(matching_object, (NBDevice, NBVM)):
+                    continue
+
+                log.debug2("Found matching MAC '%s' on %s '%s'" %
+                           (grab(interface, "data.mac_address"), object_type.name,
+                            matching_object.get_display_name(including_second_key=True)))
+
+                objects_with_matching_macs[matching_object] = objects_with_matching_macs.get(matching_object, 0) + 1
+
+        return objects_with_matching_macs
+
+    def get_vlans_by_vid(self, vid, site_object=None):
+        """
+        Return the VLAN with $vid in $site_object and the global VLAN (without a site) with $vid.
+        If more than one VLAN matches, the last one in inventory order is returned.
+
+        Parameters
+        ----------
+        vid: int
+            VLAN ID to find
+        site_object: NBSite, None
+            site the VLAN could be present
+
+        Returns
+        -------
+        tuple: (NBVLAN, None) VLAN of this site, (NBVLAN, None) global VLAN
+        """
+
+        vlan_including_site = None
+        if site_object is not None:
+            vlans = self.get_attribute_index_candidates(NBVLAN, {"vid": vid, "site": site_object})
+            if vlans is not None and len(vlans) > 0:
+                vlan_including_site = vlans[-1]
+
+        vlan_without_site = None
+        vlans = self.object_index[NBVLAN.name]["global_vid"].get(vid)
+        if vlans is not None and len(vlans) > 0:
+            vlan_without_site = vlans[-1]
+
+        return vlan_including_site, vlan_without_site
+
+    def get_longest_matching_prefix(self, ip_to_match, site_object=None):
+        """
+        Return the longest NBPrefix of $site_object which contains $ip_to_match
+
+        Parameters
+        ----------
+        ip_to_match: IPv4Address, IPv6Address
+            IP address to find prefix for
+        site_object: NBSite, None
+            site the prefix needs to be in, None to match only prefixes without a site
+
+        Returns
+        -------
+        (NBPrefix, None): longest matching IP prefix, or None if no matching prefix was found
+        """
+
+        key = site_object if site_object is not None else self.no_relation
+
+        prefix_lookup = self.prefix_lookups.get(key)
+        if prefix_lookup is None:
+            prefix_lookup = NetBoxPrefixLookup(self.get_related_objects(NBPrefix, "site", site_object))
+            self.prefix_lookups[key] = prefix_lookup
+
+        return prefix_lookup.get(ip_to_match)
+
     def get_all_items(self, object_type):
         """
         Returns list of all $object_type items inventory.
@@ -268,18 +852,10 @@ class NetBoxInventory:
         if not isinstance(this_object, (NBVM, NBDevice)):
             raise ValueError(f"Object must be a '{NBVM.name}' or '{NBDevice.name}'.")
 
-        interfaces = list()
         if isinstance(this_object, NBVM):
-            for interface in self.get_all_items(NBVMInterface):
-                if grab(interface, "data.virtual_machine") == this_object:
-                    interfaces.append(interface)
-
-        if isinstance(this_object, NBDevice):
-            for interface in self.get_all_items(NBInterface):
-                if grab(interface, "data.device") == this_object:
-                    interfaces.append(interface)
+            return self.get_related_objects(NBVMInterface, "virtual_machine", this_object)
 
-        return interfaces
+        return self.get_related_objects(NBInterface, "device", this_object)
 
     def tag_all_the_things(self, netbox_handler):
         """
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+from module.common.logging import get_logger
+from module.common.misc import plural
+
+log = get_logger()
+
+
+class NetBoxDataMerge:
+    """
+    Merges cached NetBox objects of an object type with the current state in NetBox.
+
+    The merged objects are returned one by one while iterating over an instance of this class.
+    This way cached and returned objects can be read from iterators and don't need to be held
+    in memory all at once. Once the iteration has finished the IDs of all objects which have been
+    added, changed or removed in NetBox compared to the cached data are available to update the cache.
+    """
+
+    def __init__(self, object_class, cached_objects=None, existing_ids=None, updated_objects=None):
+        """
+        Parameters
+        ----------
+        object_class: NetBoxObject sub class
+            object type of the objects to merge
+        cached_objects: iterable
+            object data dicts read from cache
+        existing_ids: set, list
+            IDs of all objects currently present in NetBox. If None, all IDs of 'updated_objects'
+            are used as currently existing IDs (full set of objects returned from NetBox)
+        updated_objects: iterable
+            object data dicts returned from NetBox which have been added/changed since the cache was written.
+            Will only be read while iterating if no 'cached_objects' are passed.
+        """
+
+        self.object_class = object_class
+
+        self.cached_objects = cached_objects
+        self.existing_ids = existing_ids
+        self.updated_objects = updated_objects or list()
+
+        if self.existing_ids is not None and not isinstance(self.existing_ids, set):
+            self.existing_ids = set(self.existing_ids)
+
+        # cached objects need to be compared with updated objects
+        if self.cached_objects is not None:
+            self.updated_objects = {x.get("id"): x for x in self.updated_objects}
+
+        self.object_count = 0
+
+        self.added_ids = set()
+        self.changed_ids = set()
+        self.removed_ids = set()
+
+    def __iter__(self):
+        """
+        Returns
+        -------
+        generator: of merged object data dicts, cached objects first
+        """
+
+        self.object_count = 0
+
+        cached_ids = set()
+
+        for cached_object in self.cached_objects or list():
+            object_id = cached_object.get("id")
+            cached_ids.add(object_id)
+
+            updated_object = self.updated_objects.get(object_id)
+
+            if updated_object is None and self.existing_ids is not None and object_id not in self.existing_ids:
+                self.removed_ids.add(object_id)
+                continue
+
+            if updated_object is None:
+                self.object_count += 1
+                yield cached_object
+                continue
+
+            if updated_object != cached_object:
+                self.changed_ids.add(object_id)
+
+        if isinstance(self.updated_objects, dict):
+            updated_objects = self.updated_objects.values()
+        else:
+            updated_objects = self.updated_objects
+
+        for updated_object in updated_objects:
+            object_id = updated_object.get("id")
+
+            if object_id not in cached_ids:
+                self.added_ids.add(object_id)
+
+            self.object_count += 1
+            yield updated_object
+
+    def get_changed_objects(self) -> list:
+        """
+        Only returns objects if 'cached_objects' have been passed
+
+        Returns
+        -------
+        list: of object data dicts of all added and changed objects
+        """
+
+        if not isinstance(self.updated_objects, dict):
+            return list()
+
+        return [x for x in self.updated_objects.values()
+                if x.get("id") in self.added_ids or x.get("id") in self.changed_ids]
+
+    def __str__(self):
+
+        return f"{self.object_count} {self.object_class.name}{plural(self.object_count)} " \
+               f"({len(self.added_ids)} added, {len(self.changed_ids)} changed, {len(self.removed_ids)} removed)"
+
+# EOF
@@ -8,6 +8,7 @@
 #  repository or visit: <https://opensource.org/licenses/MIT>.
 
 import json
+import sys
 from ipaddress import ip_network, IPv4Network, IPv6Network
 
 # noinspection PyUnresolvedReferences
@@ -258,34 +259,47 @@ class NetBoxObject:
     name = ""
     api_path = ""
     primary_key = ""
-    data_model = {}
     min_netbox_version = "0.0"
+    # NetBox content type ('app_label.model'), only needs to be set if it can't be derived from api_path
+    content_type = None
     # _mandatory_attrs must be set at subclasses
     _mandatory_attrs = ("name", "api_path", "primary_key", "data_model")
 
     # just skip this object if a mandatory attribute is missing
     skip_object_if_mandatory_attr_is_missing = False
 
-    # keep handle to inventory instance to append objects on demand
-    inventory = None
+    # attributes of data returned from NetBox which are kept besides the keys of the data model
+    netbox_data_keys = ("id", "last_updated", "tags")
+
+    # avoid a per instance __dict__, sub classes need to define empty __slots__ as well
+    __slots__ = ("data", "data_model", "inventory", "is_new", "nb_id", "source", "deleted",
+                 "_updated_items", "_unset_items", "_original_data")
+
+    # data models are equal for all instances of a class and are shared between them
+    _data_models = dict()
+
+    # returned for updated_items and unset_items as long as nothing has been changed
+    _no_items = frozenset()
 
     def __init__(self, data=None, read_from_netbox=False, inventory=None, source=None):
-        if not all(getattr(self, attr) for attr in self._mandatory_attrs):
+        if not all(getattr(self, attr, None) for attr in self._mandatory_attrs):
             raise ValueError(
                 f"FATAL: not all mandatory attributes {self._mandatory_attrs} "
                 f"are set in {self.__class__.__name__}."
             )
 
+        self.data_model = self._data_models.setdefault(self.__class__, self.data_model)
+
         # set default values
         self.data = dict()
         self.inventory = inventory
         self.is_new = True
         self.nb_id = 0
-        self.updated_items = list()
-        self.unset_items = list()
+        self._updated_items = None
+        self._unset_items = None
         self.source = source
         self.deleted = False
-        self._original_data = dict()
+        self._original_data = None
 
         # add empty lists for list items
         for key, data_type in self.data_model.items():
@@ -298,6 +312,94 @@ class NetBoxObject:
     def __repr__(self):
         return "<%s instance '%s' at %s>" % (self.__class__.__name__, self.get_display_name(), id(self))
 
+    @property
+    def updated_items(self):
+        """
+        set of data keys which have been changed and need to be sent to NetBox
+        """
+        return self._updated_items or self._no_items
+
+    @property
+    def unset_items(self):
+        """
+        set of data keys which need to be unset in NetBox
+        """
+        return self._unset_items or self._no_items
+
+    def add_updated_item(self, key):
+
+        if self._updated_items is None:
+            self._updated_items = set()
+
+        self._updated_items.add(sys.intern(key))
+
+    def remove_updated_item(self, key):
+
+        if self._updated_items is not None:
+            self._updated_items.discard(key)
+
+    def add_unset_item(self, key):
+
+        if self._unset_items is None:
+            self._unset_items = set()
+
+        self._unset_items.add(sys.intern(key))
+
+    def compact_netbox_data(self, data):
+        """
+        Reduce data returned from NetBox to the keys defined in the data model and the 'netbox_data_keys'.
+        Keys and values of choice attributes (i.e. 'status') are interned as they repeat for many objects.
+
+        Parameters
+        ----------
+        data: dict
+            object data returned from NetBox
+
+        Returns
+        -------
+        dict: reduced object data
+        """
+
+        compact_data = dict()
+        for key, value in data.items():
+
+            if key not in self.data_model and key not in self.netbox_data_keys:
+                continue
+
+            if isinstance(self.data_model.get(key), list):
+                if isinstance(value, str):
+                    value = sys.intern(value)
+                elif isinstance(value, dict):
+                    value = {sys.intern(k): sys.intern(v) if isinstance(v, str) else v for k, v in value.items()}
+
+            compact_data[sys.intern(key)] = value
+
+        return compact_data
+
+    @classmethod
+    def get_content_type(cls):
+        """
+        Return the NetBox content type of this object type, i.e. 'dcim.device'.
+        The content type is used to filter the NetBox change log for a certain object type.
+
+        Returns
+        -------
+        str: content type of this object type
+        """
+
+        if cls.content_type is not None:
+            return cls.content_type
+
+        app_label, model = cls.api_path.split("/")
+        model = model.replace("-", "")
+
+        if model.endswith("ses") or model.endswith("xes"):
+            model = model[:-2]
+        elif model.endswith("s"):
+            model = model[:-1]
+
+        return f"{app_label}.{model}"
+
     def to_dict(self):
         """
         returns this object as a dictionary
@@ -315,10 +417,12 @@ class NetBoxObject:
                 continue
             if callable(value) is True:
                 continue
-            if key in ["inventory", "default_attributes", "data_model_relation"]:
+            if key in ["inventory", "default_attributes", "data_model_relation", "_data_models", "_no_items"]:
                 continue
             if key == "source":
                 value = getattr(value, "name", None)
+            if isinstance(value, (set, frozenset)):
+                value = sorted(value)
 
             if key == "data_model":
 
@@ -447,14 +551,16 @@ class NetBoxObject:
             else:
                 log.error(f"This '{self.name}' data structure does not contain "
                           f"the primary key '{self.primary_key}' got: {data}")
+            self.update_inventory_index()
             return None
 
         if read_from_netbox is True:
             self.is_new = False
-            self.data = data
-            self.updated_items = list()
-            self.unset_items = list()
+            self.data = self.compact_netbox_data(data)
+            self._updated_items = None
+            self._unset_items = None
 
+            self.update_inventory_index(read_from_netbox=True)
             return
 
         self.set_source(source)
@@ -628,16 +734,19 @@ class NetBoxObject:
 
             if self.is_new is False:
 
-                if self._original_data.get(key) == new_value_str and key in self.updated_items:
+                original_data = self._original_data or dict()
+                if original_data.get(key) == new_value_str and key in self.updated_items:
                     self.data[key] = new_value
-                    self.updated_items.remove(key)
+                    self.remove_updated_item(key)
                     log.debug(f"{self.name.capitalize()} '{display_name}' attribute '{key}' was set back to "
                               f"original NetBox value '{current_value_str}'")
                     continue
 
                 # save original NetBox value for future use to detect updates which sets it back to the same value
                 # which is already saved in NetBox
-                elif self._original_data.get(key) is None:
+                elif original_data.get(key) is None:
+                    if self._original_data is None:
+                        self._original_data = dict()
                     self._original_data[key] = current_value_str
 
                 new_value_str = new_value_str.replace("\n", " ")
@@ -645,11 +754,13 @@ class NetBoxObject:
                          f"'{current_value_str}' to '{new_value_str}'")
 
             self.data[key] = new_value
-            self.updated_items.append(key)
+            self.add_updated_item(key)
             data_updated = True
 
             self.resolve_relations()
 
+        self.update_inventory_index()
+
         if data_updated is True and self.is_new is False:
             log.debug("Updated %s object: %s" % (self.name, self.get_display_name()))
 
@@ -661,6 +772,14 @@ class NetBoxObject:
         if source is not None and self.source is None:
             self.source = source
 
+    def update_inventory_index(self, read_from_netbox=False):
+        """
+        inform inventory about possible changes of ID, slug, display name or relations of this object
+        """
+
+        if self.inventory is not None:
+            self.inventory.update_object_index(self, read_from_netbox=read_from_netbox)
+
     def get_display_name(self, data=None, including_second_key=False):
         """
         return a name as string of this object based on primary/secondary key
@@ -777,6 +896,8 @@ class NetBoxObject:
                 log.error(f"Problems resolving relation '{key}' for object '{self.get_display_name()}' and "
                           f"value '{data_value}'")
 
+        self.update_inventory_index()
+
     def get_dependencies(self):
         """
         returns a list of NetBoxObject sub classes this object depends on
@@ -935,7 +1056,7 @@ class NetBoxObject:
         if str(current_tags.get_display_name()) != str(new_tags.get_display_name()):
 
             self.data["tags"] = new_tags
-            self.updated_items.append("tags")
+            self.add_updated_item("tags")
 
             log.info(f"{self.name.capitalize()} '{self.get_display_name()}' attribute 'tags' changed from "
                      f"'{current_tags.get_display_name()}' to '{new_tags.get_display_name()}'")
@@ -1097,7 +1218,7 @@ class NetBoxObject:
 
         # mark attribute to unset, this way it will be deleted in NetBox before any other updates are performed
         log.info(f"Setting attribute '{attribute_name}' for '{self.get_display_name()}' to None")
-        self.unset_items.append(attribute_name)
+        self.add_unset_item(attribute_name)
 
     def get_nb_reference(self):
         """
@@ -1147,6 +1268,7 @@ class NBObjectList(list):
 
 
 class NBCustomField(NetBoxObject):
+    __slots__ = ()
     name = "custom field"
     api_path = "extras/custom-fields"
     primary_key = "name"
@@ -1222,6 +1344,7 @@ class NBCustomField(NetBoxObject):
 
 
 class NBTag(NetBoxObject):
+    __slots__ = ()
     name = "tag"
     api_path = "extras/tags"
     primary_key = "name"
@@ -1258,6 +1381,7 @@ class NBTagList(NBObjectList):
 
 
 class NBTenant(NetBoxObject):
+    __slots__ = ()
     name = "tenant"
     api_path = "tenancy/tenants"
     primary_key = "name"
@@ -1275,6 +1399,7 @@ class NBTenant(NetBoxObject):
 
 
 class NBSite(NetBoxObject):
+    __slots__ = ()
     name = "site"
     api_path = "dcim/sites"
     primary_key = "name"
@@ -1292,6 +1417,7 @@ class NBSite(NetBoxObject):
 
 
 class NBVRF(NetBoxObject):
+    __slots__ = ()
     name = "VRF"
     api_path = "ipam/vrfs"
     primary_key = "name"
@@ -1308,6 +1434,7 @@ class NBVRF(NetBoxObject):
 
 
 class NBVLAN(NetBoxObject):
+    __slots__ = ()
     name = "VLAN"
     api_path = "ipam/vlans"
     primary_key = "vid"
@@ -1384,6 +1511,7 @@ class NBVLANList(NBObjectList):
 
 
 class NBPrefix(NetBoxObject):
+    __slots__ = ()
     name = "IP prefix"
     api_path = "ipam/prefixes"
     primary_key = "prefix"
@@ -1419,6 +1547,7 @@ class NBPrefix(NetBoxObject):
 
 
 class NBManufacturer(NetBoxObject):
+    __slots__ = ()
     name = "manufacturer"
     api_path = "dcim/manufacturers"
     primary_key = "name"
@@ -1435,6 +1564,7 @@ class NBManufacturer(NetBoxObject):
 
 
 class NBDeviceType(NetBoxObject):
+    __slots__ = ()
     name = "device type"
     api_path = "dcim/device-types"
     primary_key = "model"
@@ -1452,6 +1582,7 @@ class NBDeviceType(NetBoxObject):
 
 
 class NBPlatform(NetBoxObject):
+    __slots__ = ()
     name = "platform"
     api_path = "dcim/platforms"
     primary_key = "name"
@@ -1469,6 +1600,7 @@ class NBPlatform(NetBoxObject):
 
 
 class NBClusterType(NetBoxObject):
+    __slots__ = ()
     name = "cluster type"
     api_path = "virtualization/cluster-types"
     primary_key = "name"
@@ -1485,6 +1617,7 @@ class NBClusterType(NetBoxObject):
 
 
 class NBClusterGroup(NetBoxObject):
+    __slots__ = ()
     name = "cluster group"
     api_path = "virtualization/cluster-groups"
     primary_key = "name"
@@ -1502,6 +1635,7 @@ class NBClusterGroup(NetBoxObject):
 
 
 class NBDeviceRole(NetBoxObject):
+    __slots__ = ()
     name = "device role"
     api_path = "dcim/device-roles"
     primary_key = "name"
@@ -1520,6 +1654,7 @@ class NBDeviceRole(NetBoxObject):
 
 
 class NBCluster(NetBoxObject):
+    __slots__ = ()
     name = "cluster"
     api_path = "virtualization/clusters"
     primary_key = "name"
@@ -1541,6 +1676,7 @@ class NBCluster(NetBoxObject):
 
 
 class NBDevice(NetBoxObject):
+    __slots__ = ()
     name = "device"
     api_path = "dcim/devices"
     primary_key = "name"
@@ -1581,6 +1717,7 @@ class NBDevice(NetBoxObject):
 
 
 class NBVM(NetBoxObject):
+    __slots__ = ()
     name = "virtual machine"
     api_path = "virtualization/virtual-machines"
     primary_key = "name"
@@ -1609,17 +1746,15 @@ class NBVM(NetBoxObject):
         super().__init__(*args, **kwargs)
 
     def get_virtual_disks(self):
-        result_list = list()
-        for ip_object in self.inventory.get_all_items(NBVirtualDisk):
-            if grab(ip_object, "data.virtual_machine") == self:
-                result_list.append(ip_object)
 
-        return result_list
+        return self.inventory.get_related_objects(NBVirtualDisk, "virtual_machine", self)
 
 
 class NBVMInterface(NetBoxObject):
+    __slots__ = ()
     name = "virtual machine interface"
     api_path = "virtualization/interfaces"
+    content_type = "virtualization.vminterface"
     primary_key = "name"
     secondary_key = "virtual_machine"
     enforce_secondary_key = True
@@ -1642,15 +1777,11 @@ class NBVMInterface(NetBoxObject):
 
     def get_ip_addresses(self):
 
-        result_list = list()
-        for ip_object in self.inventory.get_all_items(NBIPAddress):
-            if grab(ip_object, "data.assigned_object_id") == self:
-                result_list.append(ip_object)
-
-        return result_list
+        return self.inventory.get_related_objects(NBIPAddress, "assigned_object_id", self)
 
 
 class NBInterface(NetBoxObject):
+    __slots__ = ()
     name = "interface"
     api_path = "dcim/interfaces"
     primary_key = "name"
@@ -1683,12 +1814,7 @@ class NBInterface(NetBoxObject):
 
     def get_ip_addresses(self):
 
-        result_list = list()
-        for ip_object in self.inventory.get_all_items(NBIPAddress):
-            if grab(ip_object, "data.assigned_object_id") == self:
-                result_list.append(ip_object)
-
-        return result_list
+        return self.inventory.get_related_objects(NBIPAddress, "assigned_object_id", self)
 
     def update(self, data=None, read_from_netbox=False, source=None):
 
@@ -1702,6 +1828,7 @@ class NBInterface(NetBoxObject):
 
 
 class NBVirtualDisk(NetBoxObject):
+    __slots__ = ()
     name = "Virtual Disk"
     api_path = "virtualization/virtual-disks"
     primary_key = "name"
@@ -1720,11 +1847,13 @@ class NBVirtualDisk(NetBoxObject):
 
 
 class NBIPAddress(NetBoxObject):
+    __slots__ = ()
     name = "IP address"
     api_path = "ipam/ip-addresses"
     primary_key = "address"
     is_primary = False
     prune = True
+    data_model_relation = None
 
     def __init__(self, *args, **kwargs):
         self.data_model = {
@@ -1737,15 +1866,16 @@ class NBIPAddress(NetBoxObject):
             "tenant": NBTenant,
             "vrf": NBVRF
         }
-        # add relation between two attributes
-        self.data_model_relation = {
-            "dcim.interface": NBInterface,
-            "virtualization.vminterface": NBVMInterface,
-            "ipam.fhrpgroup": NBFHRPGroupItem,
-            NBInterface: "dcim.interface",
-            NBVMInterface: "virtualization.vminterface",
-            NBFHRPGroupItem: "ipam.fhrpgroup"
-        }
+        # add relation between two attributes, shared by all instances
+        if NBIPAddress.data_model_relation is None:
+            NBIPAddress.data_model_relation = {
+                "dcim.interface": NBInterface,
+                "virtualization.vminterface": NBVMInterface,
+                "ipam.fhrpgroup": NBFHRPGroupItem,
+                NBInterface: "dcim.interface",
+                NBVMInterface: "virtualization.vminterface",
+                NBFHRPGroupItem: "ipam.fhrpgroup"
+            }
         super().__init__(*args, **kwargs)
 
     def resolve_relations(self):
@@ -1797,12 +1927,12 @@ class NBIPAddress(NetBoxObject):
 
         # we need to tell NetBox which object type this is meant to be
         if "assigned_object_id" in self.updated_items:
-            self.updated_items.append("assigned_object_type")
+            self.add_updated_item("assigned_object_type")
 
         # if ip association has been removed we also need to get rid of object type
         if "assigned_object_type" in self.updated_items and self.data.get("assigned_object_id") is None \
                 and "assigned_object_type" in self.updated_items:
-            self.updated_items.remove("assigned_object_type")
+            self.remove_updated_item("assigned_object_type")
 
         if assigned_object is None or previous_ip_device_vm is None:
             return
@@ -1863,6 +1993,7 @@ class NBFHRPGroupItem(NetBoxObject):
         This object is currently not used directly in any class.
         It is used to handle IP address object properly.
     """
+    __slots__ = ()
     name = "FHRP group"
     api_path = "ipam/fhrp-groups"
     primary_key = "group_id"
@@ -1880,6 +2011,7 @@ class NBFHRPGroupItem(NetBoxObject):
 
 
 class NBInventoryItem(NetBoxObject):
+    __slots__ = ()
     name = "inventory item"
     api_path = "dcim/inventory-items"
     primary_key = "name"
@@ -1904,6 +2036,7 @@ class NBInventoryItem(NetBoxObject):
 
 
 class NBPowerPort(NetBoxObject):
+    __slots__ = ()
     name = "power port"
     api_path = "dcim/power-ports"
     primary_key = "name"
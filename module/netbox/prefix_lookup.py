@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+from ipaddress import IPv4Network, IPv6Network
+
+from module.common.misc import grab
+
+
+class NetBoxPrefixLookup:
+    """
+    Longest prefix match over a list of NBPrefix objects.
+
+    Prefixes are stored in one hash table per IP version and prefix length, keyed by the network
+    address. A lookup masks the IP address with each used prefix length, from the longest to the
+    shortest, which takes at most one dict lookup per prefix length.
+    """
+
+    __slots__ = ("tables",)
+
+    # number of address bits per IP version
+    max_length = {4: 32, 6: 128}
+
+    def __init__(self, prefixes):
+        """
+        Parameters
+        ----------
+        prefixes: list
+            NBPrefix objects in inventory order. If the same prefix is present more than once,
+            the last one wins.
+        """
+
+        tables = {4: dict(), 6: dict()}
+
+        for prefix in prefixes:
+
+            network = grab(prefix, "data.prefix")
+            if not isinstance(network, (IPv4Network, IPv6Network)):
+                continue
+
+            tables[network.version].setdefault(network.prefixlen, dict())[int(network.network_address)] = prefix
+
+        # list of (netmask, prefixes by network address) per IP version, longest prefix first
+        self.tables = dict()
+        for ip_version, table in tables.items():
+            max_length = self.max_length[ip_version]
+            self.tables[ip_version] = [
+                (((1 << max_length) - 1) ^ ((1 << (max_length - prefix_length)) - 1), table[prefix_length])
+                for prefix_length in sorted(table, reverse=True)
+            ]
+
+    def get(self, ip_to_match):
+        """
+        Return the longest prefix containing an IP address
+
+        Parameters
+        ----------
+        ip_to_match: IPv4Address, IPv6Address
+            IP address to find prefix for
+
+        Returns
+        -------
+        (NBPrefix, None): longest matching IP prefix, or None if no matching prefix was found
+        """
+
+        ip_int = int(ip_to_match)
+
+        for netmask, prefixes in self.tables[ip_to_match.version]:
+            prefix = prefixes.get(ip_int & netmask)
+            if prefix is not None:
+                return prefix
+
+        return None
+
+# EOF
@@ -7,6 +7,8 @@
 #  For a copy, see file LICENSE.txt included in this
 #  repository or visit: <https://opensource.org/licenses/MIT>.
 
+from concurrent.futures import ThreadPoolExecutor
+
 # define all available sources here
 from module.sources.vmware.connection import VMWareHandler
 from module.sources.check_redfish.import_inventory import CheckRedfish
@@ -124,4 +126,36 @@ def instantiate_sources():
 
     return sources
 
+
+def collect_source_data(sources, max_parallel_sources=1):
+    """
+    Let all sources retrieve their data. Up to $max_parallel_sources sources run in parallel
+    as retrieving data is mostly waiting for network requests. Sources don't touch the NetBox
+    inventory while collecting, their data is added to the inventory by calling apply()
+    for each source in config order afterwards.
+
+    Parameters
+    ----------
+    sources: list
+        list of source handler objects
+    max_parallel_sources: int
+        maximum number of sources to collect data from at the same time
+    """
+
+    log = get_logger()
+
+    if max_parallel_sources <= 1 or len(sources) <= 1:
+        for source in sources:
+            source.collect()
+        return
+
+    log.info(f"Retrieving data from {len(sources)} sources, {max_parallel_sources} in parallel")
+
+    with ThreadPoolExecutor(max_workers=min(max_parallel_sources, len(sources))) as executor:
+        collect_jobs = [executor.submit(source.collect) for source in sources]
+
+    # raise exceptions of the sources in config order
+    for collect_job in collect_jobs:
+        collect_job.result()
+
 # EOF
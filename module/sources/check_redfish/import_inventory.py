@@ -125,7 +125,7 @@ class CheckRedfish(SourceBase):
             else:
                 # try to find device by serial of first system in inventory
                 device_serial = grab(self.inventory_file_content, "inventory.system.0.serial")
-                if self.device_object is None:
+                if self.device_object is None and device_serial is not None:
                     self.device_object = self.inventory.get_by_data(NBDevice, data={
                         "serial": device_serial
                     })
@@ -42,6 +42,11 @@ class SourceBase:
 
         return False
 
+    # stub function to implement retrieving source data before apply() is called.
+    # Called for multiple sources in parallel, so the NetBox inventory must not be touched here.
+    def collect(self):
+        pass
+
     # stub function to implement a finish call for each source
     def finish(self):
         pass
@@ -182,7 +187,7 @@ class SourceBase:
 
     def return_longest_matching_prefix_for_ip(self, ip_to_match=None, site_name=None):
         """
-        This is a lazy approach to find longest matching prefix to an IP address.
+        Find longest matching prefix to an IP address using the prefix lookup of the inventory.
         If site_name is set only IP prefixes from that site are matched.
 
         Parameters
@@ -212,24 +217,7 @@ class SourceBase:
                           "Skipping to find Prefix for this IP.")
                 return
 
-        current_longest_matching_prefix_length = 0
-        current_longest_matching_prefix = None
-
-        for prefix in self.inventory.get_all_items(NBPrefix):
-
-            if grab(prefix, "data.site") != site_object:
-                continue
-
-            prefix_network = grab(prefix, f"data.{NBPrefix.primary_key}")
-            if prefix_network is None:
-                continue
-
-            if ip_to_match in prefix_network and \
-                    prefix_network.prefixlen >= current_longest_matching_prefix_length:
-                current_longest_matching_prefix_length = prefix_network.prefixlen
-                current_longest_matching_prefix = prefix
-
-        return current_longest_matching_prefix
+        return self.inventory.get_longest_matching_prefix(ip_to_match, site_object)
 
     def add_update_interface(self, interface_object, device_object, interface_data, interface_ips=None,
                              vmware_object=None):
@@ -676,19 +664,8 @@ class SourceBase:
             vlan_site = self.inventory.get_by_data(NBSite, data={"name": vlan_site})
 
         return_data = vlan_data
-        vlan_object_including_site = None
-        vlan_object_without_site = None
-
-        for vlan in self.inventory.get_all_items(NBVLAN):
-
-            if grab(vlan, "data.vid") != vlan_data.get("vid"):
-                continue
-
-            if vlan_site is not None and grab(vlan, "data.site") == vlan_site:
-                vlan_object_including_site = vlan
-
-            if grab(vlan, "data.site") is None:
-                vlan_object_without_site = vlan
+        vlan_object_including_site, vlan_object_without_site = \
+            self.inventory.get_vlans_by_vid(vlan_data.get("vid"), vlan_site)
 
         if isinstance(vlan_object_including_site, NetBoxObject):
             return_data = vlan_object_including_site
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+import re
+from ipaddress import ip_address
+
+from module.common.misc import quoted_split
+from module.config import source_config_section_name
+from module.config.base import ConfigBase
+from module.config.option import ConfigOption
+from module.config.group import ConfigOptionGroup
+from module.sources.common.config import *
+from module.sources.common.permitted_subnets import PermittedSubnets
+from module.common.logging import get_logger
+
+log = get_logger()
+
+# pyvcloud client log levels, each level includes the previous ones
+vcloud_client_log_levels = ["none", "requests", "headers", "bodies"]
+
+
+class VCloudDirectorConfig(ConfigBase):
+
+    section_name = source_config_section_name
+    source_name = None
+    source_name_example = "my-vcloud-director-example"
+
+    def __init__(self):
+        self.options = [
+            ConfigOption(**config_option_enabled_definition),
+
+            ConfigOption(**{**config_option_type_definition, "config_example": "vcloud_director"}),
+
+            ConfigOption("vcloud_url",
+                         str,
+                         description="URL of the vCloud Director organization",
+                         config_example="https://tenant.provider-domain.org/tenant-id",
+                         mandatory=True),
+
+            ConfigOption("vcloud_org",
+                         str,
+                         description="name of the vCloud Director organization to log into",
+                         config_example="tenant-org",
+                         mandatory=True),
+
+            ConfigOption("username",
+                         str,
+                         description="username to use to log into vCloud Director",
+                         config_example="netBoxImport",
+                         mandatory=True),
+
+            ConfigOption("password",
+                         str,
+                         description="password to use to log into vCloud Director",
+                         config_example="super-secret",
+                         sensitive=True,
+                         mandatory=True),
+
+            ConfigOption("validate_tls_certs",
+                         bool,
+                         description="""Enforces TLS certificate validation.
+                         If vCloud Director uses a valid TLS certificate then this option should be set
+                         to 'true' to ensure a secure connection.""",
+                         default_value=False),
+
+            ConfigOption(**config_option_permitted_subnets_definition),
+
+            ConfigOptionGroup(title="filter",
+                              description="""filters can be used to include/exclude certain objects from importing
+                              into NetBox. Include filters are checked first and exclude filters after.
+                              An object name has to pass both filters to be synced to NetBox.
+                              If a filter is unset it will be ignored. Filters are all treated as regex expressions!
+                              If more then one expression should match, a '|' needs to be used
+                              """,
+                              options=[
+                                ConfigOption("vdc_exclude_filter",
+                                             str,
+                                             description="""If a VDC is excluded from sync then ALL vApps and VMs
+                                             inside the VDC will be ignored! Excluded objects are not requested
+                                             from vCloud Director at all."""),
+                                ConfigOption("vdc_include_filter", str),
+                                ConfigOption("vapp_exclude_filter",
+                                             str,
+                                             description="""If a vApp is excluded from sync then ALL VMs
+                                             inside the vApp will be ignored!"""),
+                                ConfigOption("vapp_include_filter", str),
+                                ConfigOption("vm_exclude_filter",
+                                             str, description="simply include/exclude VMs"),
+                                ConfigOption("vm_include_filter", str)
+                              ]),
+            ConfigOptionGroup(title="relations",
+                              options=[
+                                ConfigOption("cluster_site_relation",
+                                             str,
+                                             description="""\
+                                             This option defines which VDC is part of a NetBox site.
+                                             This is done with a comma separated key = value list.
+                                               key: defines the VDC name as regex
+                                               value: defines the NetBox site name (use quotes if name contains commas)
+                                             A VM always depends on the cluster site relation
+                                             """,
+                                             config_example="VDC_NYC = New York, VDC_FFM.* = Frankfurt"),
+                                ConfigOption("cluster_tenant_relation",
+                                             str,
+                                             description="""\
+                                             This option defines which VDC belongs to which tenant.
+                                             This is done with a comma separated key = value list.
+                                               key: defines a VDC name as regex
+                                               value: defines the NetBox tenant name (use quotes if name contains commas)
+                                             """,
+                                             config_example="VDC_NYC.* = Customer A"),
+                                ConfigOption("vm_role_relation",
+                                             str,
+                                             description="""\
+                                             Define the NetBox device role used for VMs. The default is
+                                             set to "Server". This is done with a comma separated key = value list.
+                                               key: defines VM(s) name as regex
+                                               value: defines the NetBox role name (use quotes if name contains commas)
+                                             """,
+                                             config_example=".* = Server")
+                              ]),
+            ConfigOption("dns_name_lookup",
+                         bool,
+                         description="""Perform a reverse lookup for all collected IP addresses.
+                         If a dns name was found it will be added to the IP address object in NetBox
+                         """,
+                         default_value=True),
+            ConfigOption("custom_dns_servers",
+                         str,
+                         description="use custom DNS server to do the reverse lookups",
+                         config_example="192.168.1.11, 192.168.1.12"),
+            ConfigOption("set_primary_ip",
+                         str,
+                         description="""\
+                         define how the primary IPs should be set
+                         possible values:
+
+                           always:     will remove primary IP from the object where this address is
+                                       currently set as primary and moves it to new object
+
+                           when-undefined:
+                                       only sets primary IP if undefined, will cause ERRORs if same IP is
+                                       assigned more then once to different hosts and IP is set as the
+                                       objects primary IP
+
+                           never:      don't set any primary IPs, will cause the same ERRORs
+                                       as "when-undefined"
+                         """,
+                         default_value="when-undefined"),
+            ConfigOption("use_query_api",
+                         bool,
+                         description="""retrieve VMs and networks with the vCloud Director typed query API
+                         instead of walking through every vApp and VM one by one""",
+                         default_value=True),
+            ConfigOption("query_page_size",
+                         int,
+                         description="""number of records returned by a single typed query request.
+                         vCloud Director limits this to the configured maximum page size (default: 128)""",
+                         default_value=128),
+            ConfigOption("max_workers",
+                         int,
+                         description="number of threads used to fetch VDCs, vApps and VMs at the same time",
+                         default_value=4),
+            ConfigOption("connection_pool_size",
+                         int,
+                         description="""maximum number of HTTP connections kept open to vCloud Director.
+                         If unset the value of 'max_workers' is used""",
+                         config_example=4),
+            ConfigOption("request_timeout",
+                         int,
+                         description="timeout in seconds for a single request to vCloud Director",
+                         default_value=120),
+            ConfigOption("client_log_level",
+                         str,
+                         description="""\
+                         define what the pyvcloud client writes to 'client_log_file'
+                         possible values:
+                           none:       don't write a log file
+                           requests:   log all requests
+                           headers:    log all requests including headers
+                           bodies:     log all requests including headers and bodies.
+                                       ATTENTION: very large log file and contains sensitive data
+                         """,
+                         default_value="none"),
+            ConfigOption("client_log_file",
+                         str,
+                         description="""Destination of the pyvcloud client log file if 'client_log_level'
+                         is not 'none'. Relative paths are relative to the netbox-sync directory""",
+                         default_value="log/pyvcloud.log")
+        ]
+
+        super().__init__()
+
+    def validate_options(self):
+
+        for option in self.options:
+
+            if option.value is None:
+                continue
+
+            if "filter" in option.key:
+
+                re_compiled = None
+                try:
+                    re_compiled = re.compile(option.value)
+                except Exception as e:
+                    log.error(f"Problem parsing regular expression for '{self.source_name}.{option.key}': {e}")
+                    self.set_validation_failed()
+
+                option.set_value(re_compiled)
+
+                continue
+
+            if "relation" in option.key:
+
+                relation_data = list()
+
+                relation_type = option.key.split("_")[1]
+
+                for relation in quoted_split(option.value):
+
+                    object_name = relation.split("=")[0].strip(' "')
+                    relation_name = relation.split("=")[1].strip(' "')
+
+                    if len(object_name) == 0 or len(relation_name) == 0:
+                        log.error(f"Config option '{relation}' malformed got '{object_name}' for "
+                                  f"object name and '{relation_name}' for {relation_type} name.")
+                        self.set_validation_failed()
+                        continue
+
+                    try:
+                        re_compiled = re.compile(object_name)
+                    except Exception as e:
+                        log.error(f"Problem parsing regular expression '{object_name}' for '{relation}': {e}")
+                        self.set_validation_failed()
+                        continue
+
+                    relation_data.append({
+                        "object_regex": re_compiled,
+                        "assigned_name": relation_name
+                    })
+
+                option.set_value(relation_data)
+
+                continue
+
+            if option.key == "set_primary_ip":
+                if option.value not in ["always", "when-undefined", "never"]:
+                    log.error(f"Primary IP option '{option.key}' value '{option.value}' invalid.")
+                    self.set_validation_failed()
+
+            if option.key == "custom_dns_servers":
+
+                dns_name_lookup = self.get_option_by_name("dns_name_lookup")
+
+                if not isinstance(dns_name_lookup, ConfigOption) or dns_name_lookup.value is False:
+                    continue
+
+                custom_dns_servers = quoted_split(option.value)
+
+                tested_custom_dns_servers = list()
+                for custom_dns_server in custom_dns_servers:
+                    try:
+                        tested_custom_dns_servers.append(str(ip_address(custom_dns_server)))
+                    except ValueError:
+                        log.error(f"Config option 'custom_dns_servers' value '{custom_dns_server}' "
+                                  f"does not appear to be an IP address.")
+                        self.set_validation_failed()
+
+                option.set_value(tested_custom_dns_servers)
+
+                continue
+
+            if option.key in ["query_page_size", "max_workers", "connection_pool_size", "request_timeout"] and \
+                    option.value < 1:
+                log.error(f"Config option '{option.key}' in '{self.source_name}' must be 1 or greater, "
+                          f"got: {option.value}")
+                self.set_validation_failed()
+
+            if option.key == "client_log_level" and option.value not in vcloud_client_log_levels:
+                log.error(f"Config option '{option.key}' value '{option.value}' invalid. "
+                          f"Possible values: {', '.join(vcloud_client_log_levels)}")
+                self.set_validation_failed()
+
+        permitted_subnets_option = self.get_option_by_name("permitted_subnets")
+
+        if permitted_subnets_option is not None:
+            permitted_subnets = PermittedSubnets(permitted_subnets_option.value)
+            if permitted_subnets.validation_failed is True:
+                self.set_validation_failed()
+
+            permitted_subnets_option.set_value(permitted_subnets)
+
+# EOF
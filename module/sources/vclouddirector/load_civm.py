@@ -9,8 +9,10 @@
 
 import os
 import re
+import logging
 import math
 import pprint
+from concurrent.futures import ThreadPoolExecutor
 from ipaddress import ip_address, ip_network, ip_interface, IPv4Network
 from urllib.parse import unquote
 #
@@ -18,9 +20,12 @@ from urllib.parse import unquote
 from packaging import version
 
 from module.sources.common.source_base import SourceBase
+from module.sources.vclouddirector.config import VCloudDirectorConfig, vcloud_client_log_levels
+from module.sources.vclouddirector.network_catalog import VCDNetworkCatalog
 from module.common.logging import get_logger, DEBUG3
-from module.common.misc import grab, get_string_or_none
-from module.common.support import normalize_mac_address, ip_valid_to_add_to_netbox
+from module.common.misc import grab, get_string_or_none, plural
+from module.common.support import normalize_mac_address
+from module.netbox.inventory import NetBoxInventory
 from module.netbox.object_classes import (
     NetBoxObject,
     NetBoxInterfaceType,
@@ -48,12 +53,12 @@ from module.netbox.object_classes import (
 # Import Modules for Vcloud Director
 import sys
 import requests
-import xmltodict
-from lxml import etree
 from lxml import objectify
 from pyvcloud.vcd.client import BasicLoginCredentials
 from pyvcloud.vcd.client import Client
 from pyvcloud.vcd.client import EntityType
+from pyvcloud.vcd.client import QueryResultFormat
+from pyvcloud.vcd.client import ResourceType
 from pyvcloud.vcd.org import Org
 from pyvcloud.vcd.vdc import VDC
 from pyvcloud.vcd.vapp import VApp
@@ -62,6 +67,22 @@ from pyvcloud.vcd.vm import VM
 log = get_logger()
 
 
+class VCDHTTPAdapter(requests.adapters.HTTPAdapter):
+    """
+    HTTPAdapter which applies a timeout to all requests. pyvcloud doesn't pass a timeout
+    to the requests session, without it a stalled connection blocks a fetch worker forever.
+    """
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
 class CheckCloudDirector(SourceBase):
     """
     Source class to import Vcloud Director inventory files
@@ -89,175 +110,326 @@ class CheckCloudDirector(SourceBase):
         NBCustomField
     ]
 
-    settings = {
-        "enabled": True,
-        "vcloud_url": None,
-        "validate_tls_certs": False,
-        "username": None,
-        "password": None,
-        "vcloud_org": None,
-        "permitted_subnets": None,
-        "excluded_subnets": None,
-        "overwrite_host_name": False,
-        "overwrite_interface_name": False,
-        "overwrite_interface_attributes": True,
-        "cluster_tenant_relation": None,
-        "cluster_site_relation": None,
-        "vdc_include_filter": None,
-        "vdc_exclude_filter": None,
-        "set_primary_ip": "when-undefined"
-    }
-
     init_successful = False
     inventory = None
     name = None
+    settings = None
     source_tag = None
     source_type = "vcloud_director"
-    enabled = False
 
     vcloudClient = None
     device_object = None
-    
+
+    # data retrieved by collect()
+    collected_data = None
+
+    # number of objects skipped by filters and requests not sent because of them
+    filtered_objects = None
+    avoided_requests = 0
+
     site_name = None
-    #permitted_subnets = None
-    #vcd_org     
 
-    def __init__(self, name=None, settings=None, inventory=None):
-  
+    def __init__(self, name=None):
+
         if name is None:
             raise ValueError(f"Invalid value for attribute 'name': '{name}'.")
 
-        self.inventory = inventory
+        self.inventory = NetBoxInventory()
         self.name = name
 
-        self.parse_config_settings(settings)
+        # parse settings
+        settings_handler = VCloudDirectorConfig()
+        settings_handler.source_name = self.name
+        self.settings = settings_handler.parse()
 
-        self.source_tag = f"Source: {name}"
+        self.set_source_tag()
         self.site_name = f"vCloudDirector: {name}"
 
-        if self.enabled is False:
+        if self.settings.enabled is False:
             log.info(f"Source '{name}' is currently disabled. Skipping")
             return
-        
+
         self.create_api_session()
 
         self.init_successful = True
 
         self.permitted_clusters = dict()
 
-        self.vdc_network_info = dict()
+        self.network_catalog = VCDNetworkCatalog()
+
+    def collect(self):
+        """
+        Retrieve all VDCs, VMs and networks of the organization without touching
+        the NetBox inventory. This is called for all sources in parallel before apply().
+
+        By default, VMs and networks are retrieved with the typed query API. If 'use_query_api'
+        is disabled all vApps and VMs are walked through one by one.
+
+        VDCs, vApps and VMs which don't pass the configured filters are skipped before any
+        further data of them is requested.
+        """
+
+        log.info(f"Retrieving data from vCloud Director: '{self.settings.vcloud_url}'")
+
+        self.filtered_objects = {"vdc": 0, "vapp": 0, "vm": 0}
+        self.avoided_requests = 0
+
+        vdc_org = self.get_vcloud_org(self.vcloudClient)
+        vdc_list = [x for x in self.get_vdc_list(vdc_org) if self.passes_object_filter("vdc", x.get('name'))]
+
+        # all org VDC networks are shared by the vApps, load them once
+        self.network_catalog.load(self.typed_query(ResourceType.ORG_VDC_NETWORK,
+                                                   "name,vdc,defaultGateway,netmask,subnetPrefixLength"))
 
+        if self.settings.use_query_api is False:
+            # each VDC would have been retrieved and its vApps listed
+            self.avoided_requests += 2 * self.filtered_objects["vdc"]
+            vms_per_vdc = self.walk_vdc_vms(vdc_org, vdc_list)
+        else:
+            vms_per_vdc = self.query_vdc_vms(vdc_list)
+
+        self.collected_data = {
+            "org_name": vdc_org.get_name(),
+            "vdcs": [{"vdc": vdc, "vms": vms_per_vdc.get(vdc['name'], list())} for vdc in vdc_list]
+        }
 
-    def parse_config_settings(self, config_settings):
+    def walk_vdc_vms(self, vdc_org, vdc_list):
         """
-        Validate parsed settings from config file
+        Retrieve all VMs by walking through each VDC, vApp and VM.
+        VDCs, vApps and VMs are fetched with up to 'max_workers' threads.
 
         Parameters
         ----------
-        config_settings: dict
-            dict of config settings
+        vdc_org: Org
+            organization of this source
+        vdc_list: list
+            all VDCs of the organization
 
+        Returns
+        -------
+        dict: list of VM data per VDC name
         """
-        
-        validation_failed = False
-        for setting in ["vcloud_url", "vcloud_org", "username", "password"]:
-            if config_settings.get(setting) is None:
-                log.error(f"Config option '{setting}' in 'source/{self.name}' can't be empty/undefined")
-                validation_failed = True
-
-        # check permitted ip subnets
-        if config_settings.get("permitted_subnets") is None:
-            log.info(f"Config option 'permitted_subnets' in 'source/{self.name}' is undefined. "
-                     f"No IP addresses will be populated to NetBox!")
-        else:
-            config_settings["permitted_subnets"] = \
-                [x.strip() for x in config_settings.get("permitted_subnets").split(",") if x.strip() != ""]
-
-            permitted_subnets = list()
-            for permitted_subnet in config_settings["permitted_subnets"]:
-                try:
-                    permitted_subnets.append(ip_network(permitted_subnet))
-                except Exception as e:
-                    log.error(f"Problem parsing permitted subnet: {e}")
-                    validation_failed = True
-
-            config_settings["permitted_subnets"] = permitted_subnets
-
-        # check include and exclude filter expressions
-        for setting in [x for x in config_settings.keys() if "filter" in x]:
-            if config_settings.get(setting) is None or config_settings.get(setting).strip() == "":
-                continue
 
-            re_compiled = None
-            try:
-                re_compiled = re.compile(config_settings.get(setting))
-            except Exception as e:
-                log.error(f"Problem parsing regular expression for '{setting}': {e}")
-                validation_failed = True
+        def fetch_vdc_vapps(vdc):
+            vdc_obj = VDC(self.vcloudClient, resource=vdc_org.get_vdc(vdc['name']))
+            return [(vdc['name'], vdc_obj, vapp) for vapp in vdc_obj.list_resources(EntityType.VAPP)]
+
+        vapp_list = list()
+        for vdc_vapps in self.fetch_in_parallel(fetch_vdc_vapps, vdc_list):
+            vapp_list.extend([x for x in vdc_vapps if self.passes_object_filter("vapp", x[2].get('name'))])
+
+        vm_list = list()
+        for vdc_name, vm_resource in self.fetch_in_parallel(self.fetch_vapp, vapp_list):
+            vm_list.extend([(vdc_name, x) for x in vm_resource if self.passes_object_filter("vm", x.get('name'))])
+
+        # each filtered vApp would have been retrieved and each filtered VM its OS section
+        self.avoided_requests += self.filtered_objects["vapp"] + self.filtered_objects["vm"]
 
-            config_settings[setting] = re_compiled
+        vm_data_list = self.fetch_in_parallel(lambda x: self.get_vm_data_from_resource(x[1]), vm_list)
+
+        vms_per_vdc = {vdc['name']: list() for vdc in vdc_list}
+        for (vdc_name, _), vm_data in zip(vm_list, vm_data_list):
+            vms_per_vdc[vdc_name].append(vm_data)
+
+        return vms_per_vdc
+
+    @staticmethod
+    def fetch_vapp(vdc_vapp):
+        """
+        Retrieve the VMs of a vApp
+
+        Parameters
+        ----------
+        vdc_vapp: tuple
+            VDC name, VDC object and vApp record
+
+        Returns
+        -------
+        tuple: VDC name, list of VM resources
+        """
 
-        for relation_option in [x for x in self.settings.keys() if "relation" in x]:
+        vdc_name, vdc_obj, vapp = vdc_vapp
 
-            if config_settings.get(relation_option) is None:
+        vapp_name = vapp.get('name')
+        vapp_obj = VApp(vdc_obj.client, resource=vdc_obj.get_vapp(vapp_name))
+
+        vm_resource = vapp_obj.get_all_vms()
+        log.debug(f"Found '{len(vm_resource)}' vm in '{vapp_name}'")
+
+        return vdc_name, list(vm_resource)
+
+    def typed_query(self, resource_type, fields, qfilter=None):
+        """
+        Run a paged typed query and return all records
+
+        Parameters
+        ----------
+        resource_type: ResourceType
+            query type, i.e. ResourceType.VM
+        fields: str
+            comma separated list of record attributes to return
+        qfilter: str
+            optional query filter expression
+
+        Returns
+        -------
+        list: of all records
+        """
+
+        query = self.vcloudClient.get_typed_query(resource_type.value,
+                                                  query_result_format=QueryResultFormat.RECORDS,
+                                                  page_size=self.settings.query_page_size,
+                                                  fields=fields,
+                                                  qfilter=qfilter)
+
+        records = list(query.execute())
+
+        log.debug(f"Query '{resource_type.value}' returned {len(records)} records")
+
+        return records
+
+    def query_vdc_vms(self, vdc_list):
+        """
+        Retrieve all VMs and their NICs with the typed query API.
+
+        VM records don't contain the NICs of a VM, so the NICs of all VMs of a vApp are read
+        from the vApp resource with one request per vApp. vApps which contain no VM passing
+        the VDC, vApp and VM filters are not requested.
+
+        Parameters
+        ----------
+        vdc_list: list
+            all VDCs of the organization
+
+        Returns
+        -------
+        dict: list of VM data per VDC name
+        """
+
+        vdc_names = {vdc.get('href'): vdc.get('name') for vdc in vdc_list}
+
+        # filter result of each vApp by vApp href
+        permitted_vapps = dict()
+
+        vm_records = list()
+        for vm_record in self.typed_query(ResourceType.VM,
+                                          "name,status,numberOfCpus,memoryMB,totalStorageAllocatedMb,guestOs,vdc,"
+                                          "container,containerName",
+                                          qfilter="isVAppTemplate==false"):
+
+            vapp_href = vm_record.get('container')
+
+            vdc_name = vdc_names.get(vm_record.get('vdc'))
+            if vdc_name is None:
+                log.debug2(f"VDC of VM '{vm_record.get('name')}' not found or filtered. Skipping")
+                permitted_vapps.setdefault(vapp_href, False)
                 continue
 
-            relation_data = list()
+            if vapp_href not in permitted_vapps:
+                permitted_vapps[vapp_href] = self.passes_object_filter("vapp", vm_record.get('containerName'))
 
-            relation_type = relation_option.split("_")[1]
+            if permitted_vapps[vapp_href] is False or \
+                    self.passes_object_filter("vm", vm_record.get('name')) is False:
+                continue
 
-            # obey quotations to be able to add names including a comma
-            # thanks to: https://stackoverflow.com/a/64333329
-            for relation in re.split(r",(?=(?:[^\"']*[\"'][^\"']*[\"'])*[^\"']*$)",
-                                     config_settings.get(relation_option)):
+            vm_records.append((vdc_name, vm_record))
 
-                object_name = relation.split("=")[0].strip(' "')
-                relation_name = relation.split("=")[1].strip(' "')
+        vapp_hrefs = list(dict.fromkeys([x[1].get('container') for x in vm_records]))
 
-                if len(object_name) == 0 or len(relation_name) == 0:
-                    log.error(f"Config option '{relation}' malformed got '{object_name}' for "
-                              f"object name and '{relation_name}' for {relation_type} name.")
-                    validation_failed = True
+        # without filters each vApp which contains a VM would have been requested
+        self.avoided_requests += len(permitted_vapps.keys() - set(vapp_hrefs))
 
-                try:
-                    re_compiled = re.compile(object_name)
-                except Exception as e:
-                    log.error(f"Problem parsing regular expression '{object_name}' for '{relation}': {e}")
-                    validation_failed = True
-                    continue
+        def fetch_vapp_nics(vapp_href):
+            vapp_obj = VApp(self.vcloudClient, resource=self.vcloudClient.get_resource(vapp_href))
+            return {x.get('href'): VM(self.vcloudClient, resource=x).list_nics() for x in vapp_obj.get_all_vms()}
 
-                relation_data.append({
-                    "object_regex": re_compiled,
-                    "assigned_name": relation_name
-                })
+        nics_per_vm = dict()
+        for vapp_nics in self.fetch_in_parallel(fetch_vapp_nics, vapp_hrefs):
+            nics_per_vm.update(vapp_nics)
 
-            config_settings[relation_option] = relation_data
+        vms_per_vdc = dict()
+        for vdc_name, vm_record in vm_records:
 
-        if config_settings.get("dns_name_lookup") is True and config_settings.get("custom_dns_servers") is not None:
+            if vms_per_vdc.get(vdc_name) is None:
+                vms_per_vdc[vdc_name] = list()
 
-            custom_dns_servers = \
-                [x.strip() for x in config_settings.get("custom_dns_servers").split(",") if x.strip() != ""]
+            vms_per_vdc[vdc_name].append(
+                self.get_vm_data_from_record(vm_record, nics_per_vm.get(vm_record.get('href'), list()))
+            )
 
-            tested_custom_dns_servers = list()
-            for custom_dns_server in custom_dns_servers:
-                try:
-                    tested_custom_dns_servers.append(str(ip_address(custom_dns_server)))
-                except ValueError:
-                    log.error(f"Config option 'custom_dns_servers' value '{custom_dns_server}' "
-                              f"does not appear to be an IP address.")
-                    validation_failed = True
+        return vms_per_vdc
 
-            config_settings["custom_dns_servers"] = tested_custom_dns_servers
+    def get_vm_data_from_resource(self, vm_res):
+        """
+        Extract the VM data used by add_virtual_machine from a VM resource
 
-        if validation_failed is True:
-            log.error("Config validation failed. Exit!")
-            exit(1)
+        Parameters
+        ----------
+        vm_res: objectify.ObjectifiedElement
+            VM resource
 
-        for setting in self.settings.keys():
-            setattr(self, setting, config_settings.get(setting))
+        Returns
+        -------
+        dict: VM data
+        """
 
-        
+        vapp_vm = VM(self.vcloudClient, resource=vm_res)
+
+        vm_data = {
+            "name": vm_res.attrib["name"],
+            "powered_on": vapp_vm.is_powered_on(),
+            "vcpus": None,
+            "memory": None,
+            "disk_size": 0
+        }
+
+        for hw_element in vapp_vm.list_virtual_hardware_section(is_disk=True):
+            vcpus = grab(hw_element, 'cpuVirtualQuantity')
+            if vcpus:
+                vm_data['vcpus'] = int(vcpus)
+            memory = grab(hw_element, 'memoryVirtualQuantityInMb')
+            if memory:
+                vm_data['memory'] = int(memory)
+            if grab(hw_element, 'diskElementName'):
+                vm_data['disk_size'] += grab(hw_element, 'diskVirtualQuantityInBytes')
 
+        vm_data['platform'] = str(grab(vapp_vm.list_os_section(), 'Description'))
+        vm_data['nics'] = vapp_vm.list_nics()
+
+        return vm_data
+
+    @staticmethod
+    def get_vm_data_from_record(vm_record, nics):
+        """
+        Extract the VM data used by add_virtual_machine from a VM query record
+
+        Parameters
+        ----------
+        vm_record: objectify.ObjectifiedElement
+            VM query record
+        nics: list
+            NICs of this VM as returned by VM.list_nics()
+
+        Returns
+        -------
+        dict: VM data
+        """
+
+        def as_int(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+
+        return {
+            "name": vm_record.get('name'),
+            "powered_on": vm_record.get('status') == "POWERED_ON",
+            "vcpus": as_int(vm_record.get('numberOfCpus')),
+            "memory": as_int(vm_record.get('memoryMB')),
+            "disk_size": (as_int(vm_record.get('totalStorageAllocatedMb')) or 0) * 1024 * 1024,
+            "platform": vm_record.get('guestOs'),
+            "nics": nics
+        }
 
     def apply(self):
         """
@@ -266,58 +438,35 @@ class CheckCloudDirector(SourceBase):
 
         Every update of new/existing objects fot this source has to happen here.
 
-        First try to find and iterate over each inventory file.
-        Then parse the system data first and then all components.
+        Data retrieved by collect() is added to the inventory. If collect() has not been
+        called before, the data is retrieved first.
         """
         # add tags
         self.add_necessary_base_objects()
-        
-        vdc_org = self.get_vcloud_org(self.vcloudClient)
-        self.add_datacenter( {"name": vdc_org.get_name() } )
-
-        vdc_list = self.get_vdc_list(vdc_org)
-
-        for vdc in vdc_list:
-            
-            log.info(f"Add virtual cluster for '{vdc_org.get_name()}")
-            self.add_cluster(vdc,vdc_org.get_name())
-            vdc_resource = vdc_org.get_vdc(vdc['name'])
-            vdc_obj = VDC(self.vcloudClient, resource=vdc_resource)
-            vapp_list = vdc_obj.list_resources(EntityType.VAPP)
-            for vapp in vapp_list:
-                vapp_name = vapp.get('name')
-                vapp_resource = vdc_obj.get_vapp(vapp_name)
-                vapp_obj = VApp(self.vcloudClient, resource=vapp_resource)
-
-                log.info(f"Get Information About vAppNetwork for VApp: '{vapp_name}'")
-                try:
-                    vapp_net = vapp_obj.get_vapp_network_list()
-                except:
-                    log.error(f"Fail Get networking information for vApp:'{vapp_name}'")
-                    pass
-                    
-                for vnet in vapp_net: 
-                    try:                   
-                        vnet_data = vdc_obj.get_routed_orgvdc_network(vnet['name'])                    
-                        self.vdc_network_info[vnet['name']] = self.get_vcd_network(vnet_data)
-                    except:
-                        log.debug(f"Fail get data For routed_orgvdc_network'{vnet['name']}'")
-
-                vm_resource = vapp_obj.get_all_vms()
-                log.debug(f"Found '{len(vm_resource)}' vm in '{vapp_name}'")
-                
-                log.info(f"Get vm data from vApp '{vapp_name}'")
-                for vm_res in vm_resource:
-                    self.add_virtual_machine(vm_res,vdc['name'])        
-                    #break
-                #print(type(vm_resource))
-                #break
-
-        #for view_name, view_details in object_mapping.items():
+
+        if self.collected_data is None:
+            self.collect()
+
+        org_name = self.collected_data.get("org_name")
+        self.add_datacenter({"name": org_name})
+
+        for vdc_data in self.collected_data.get("vdcs"):
+
+            vdc = vdc_data.get("vdc")
+
+            log.info(f"Add virtual cluster for '{org_name}")
+            self.add_cluster(vdc, org_name)
+
+            log.info(f"Get vm data from VDC '{vdc['name']}'")
+            for vm_info in vdc_data.get("vms"):
+                self.add_virtual_machine(vm_info, vdc['name'], vdc.get('href'))
+
+        self.network_catalog.log_statistics()
+        self.log_filter_statistics()
+
         self.update_basic_data()
         self.vcloudClient.logout()
 
-
     def add_necessary_base_objects(self):
         """
         Adds/updates source tag and all custom fields necessary for this source.
@@ -330,19 +479,85 @@ class CheckCloudDirector(SourceBase):
         })
 
     def create_api_session(self):
-        #print(settings)
+        """
+        Log into vCloud Director. The pyvcloud client log file is only written
+        if 'client_log_level' is not 'none'.
+
+        pyvcloud always opens a log file and falls back to 'vcd_pysdk.log' in the current
+        directory. If client logging is disabled, the log file is set to os.devnull and the
+        client logger is replaced with one which discards all messages.
+        """
+
         log.info(f"Create API session for '{self.name}'")
         requests.packages.urllib3.disable_warnings()
-        client = Client(self.vcloud_url,
-            verify_ssl_certs=self.validate_tls_certs,
-            log_file='pyvcloud.log',
-            log_requests=True,
-            log_headers=True,
-            log_bodies=True)
+
+        client_log_level = vcloud_client_log_levels.index(self.settings.client_log_level)
+
+        client_log_file = os.devnull
+        if client_log_level > 0:
+            client_log_file = self.settings.client_log_file
+            if not os.path.isabs(client_log_file):
+                base_dir = os.sep.join(__file__.split(os.sep)[0:-4])
+                client_log_file = f"{base_dir}{os.sep}{client_log_file}"
+            log.debug(f"Writing vCloud Director client log '{self.settings.client_log_level}' to '{client_log_file}'")
+
+        client = Client(self.settings.vcloud_url,
+                        verify_ssl_certs=self.settings.validate_tls_certs,
+                        log_file=client_log_file,
+                        log_requests=client_log_level >= vcloud_client_log_levels.index("requests"),
+                        log_headers=client_log_level >= vcloud_client_log_levels.index("headers"),
+                        log_bodies=client_log_level >= vcloud_client_log_levels.index("bodies"))
+
+        if client_log_level == 0:
+            # noinspection PyProtectedMember
+            for handler in list(client._logger.handlers):
+                # noinspection PyProtectedMember
+                client._logger.removeHandler(handler)
+                handler.close()
+
+            null_logger = logging.getLogger(f"{__name__}.client.{self.name}")
+            null_logger.addHandler(logging.NullHandler())
+            null_logger.propagate = False
+            null_logger.disabled = True
+            client._logger = null_logger
+
         client.set_highest_supported_version()
-        client.set_credentials(BasicLoginCredentials(self.username, self.vcloud_org, self.password))
+        client.set_credentials(BasicLoginCredentials(self.settings.username, self.settings.vcloud_org,
+                                                     self.settings.password))
+
+        # set_credentials() creates the requests session, mount the adapter afterwards.
+        # The authenticated session is shared by all fetch workers, keep a connection for each of them
+        # noinspection PyProtectedMember
+        client._session.mount("https://", VCDHTTPAdapter(
+            timeout=self.settings.request_timeout,
+            pool_connections=1,
+            pool_maxsize=self.settings.connection_pool_size or self.settings.max_workers
+        ))
+
         self.vcloudClient = client
 
+    def fetch_in_parallel(self, fetch_function, items):
+        """
+        Call $fetch_function for each item using up to 'max_workers' threads
+
+        Parameters
+        ----------
+        fetch_function: function
+            function to call with each item
+        items: list
+            items to fetch data for
+
+        Returns
+        -------
+        list: results of $fetch_function in the same order as $items
+        """
+
+        if self.settings.max_workers <= 1 or len(items) <= 1:
+            return [fetch_function(x) for x in items]
+
+        with ThreadPoolExecutor(max_workers=min(self.settings.max_workers, len(items))) as executor:
+            return list(executor.map(fetch_function, items))
+
     def get_vcloud_org(self, client):
         org_resource = client.get_org()
         return Org(client, resource=org_resource)        
@@ -387,6 +602,41 @@ class CheckCloudDirector(SourceBase):
         return True
 
 
+    def passes_object_filter(self, object_type, name):
+        """
+        checks if the name of a VDC, vApp or VM passes the include and exclude filter
+        of this object type and counts filtered objects.
+
+        Parameters
+        ----------
+        object_type: str
+            type of the object: vdc, vapp or vm
+        name: str
+            name of the object to check
+
+        Returns
+        -------
+        bool: True if all filter passed, otherwise False
+        """
+
+        if self.passes_filter(name or "", getattr(self.settings, f"{object_type}_include_filter"),
+                              getattr(self.settings, f"{object_type}_exclude_filter")) is True:
+            return True
+
+        self.filtered_objects[object_type] += 1
+
+        return False
+
+    def log_filter_statistics(self):
+
+        if sum(self.filtered_objects.values()) == 0:
+            return
+
+        log.info(f"Filters skipped {self.filtered_objects['vdc']} VDC{plural(self.filtered_objects['vdc'])}, "
+                 f"{self.filtered_objects['vapp']} vApp{plural(self.filtered_objects['vapp'])} and "
+                 f"{self.filtered_objects['vm']} VM{plural(self.filtered_objects['vm'])}, avoiding "
+                 f"{self.avoided_requests} request{plural(self.avoided_requests)} to vCloud Director")
+
     def get_object_relation(self, name, relation, fallback=None):
         """
 
@@ -406,7 +656,7 @@ class CheckCloudDirector(SourceBase):
         """
 
         resolved_list = list()
-        for single_relation in grab(self, relation, fallback=list()):
+        for single_relation in grab(self.settings, relation, fallback=list()):
             object_regex = single_relation.get("object_regex")
             if object_regex.match(name):
                 resolved_name = single_relation.get("assigned_name")
@@ -473,8 +723,8 @@ class CheckCloudDirector(SourceBase):
         """
         Try to find a NetBox object based on list of MAC addresses.
 
-        Iterate over all interfaces of this object type and compare MAC address with list of desired MAC
-        addresses. If match was found store related machine object and count every correct match.
+        Look up all interfaces of this object type with a MAC address of the list of desired MAC
+        addresses in the MAC address index of the inventory and count matching interfaces per machine.
 
         If exactly one machine with matching interfaces was found then this one will be returned.
 
@@ -507,38 +757,18 @@ class CheckCloudDirector(SourceBase):
         if mac_list is None or not isinstance(mac_list, list) or len(mac_list) == 0:
             return
 
-        interface_typ = NBInterface if object_type == NBDevice else NBVMInterface
-
-        objects_with_matching_macs = dict()
-        matching_object = None
-
-        for interface in self.inventory.get_all_items(interface_typ):
-
-            if grab(interface, "data.mac_address") in mac_list:
-
-                matching_object = grab(interface, f"data.{interface.secondary_key}")
-                if not isinstance(matching_object, (NBDevice, NBVM)):
-                    continue
-
-                log.debug2("Found matching MAC '%s' on %s '%s'" %
-                           (grab(interface, "data.mac_address"), object_type.name,
-                            matching_object.get_display_name(including_second_key=True)))
-
-                if objects_with_matching_macs.get(matching_object) is None:
-                    objects_with_matching_macs[matching_object] = 1
-                else:
-                    objects_with_matching_macs[matching_object] += 1
+        objects_with_matching_macs = self.inventory.count_matching_macs(object_type, mac_list)
 
         # try to find object based on amount of matching MAC addresses
         num_devices_witch_matching_macs = len(objects_with_matching_macs.keys())
 
-        if num_devices_witch_matching_macs == 1 and isinstance(matching_object, (NBDevice, NBVM)):
-
-            log.debug2("Found one %s '%s' based on MAC addresses and using it" %
-                       (object_type.name, matching_object.get_display_name(including_second_key=True)))
+        if num_devices_witch_matching_macs == 1:
 
             object_to_return = list(objects_with_matching_macs.keys())[0]
 
+            log.debug2("Found one %s '%s' based on MAC addresses and using it" %
+                       (object_type.name, object_to_return.get_display_name(including_second_key=True)))
+
         elif num_devices_witch_matching_macs > 1:
 
             log.debug2(f"Found {num_devices_witch_matching_macs} {object_type.name}s with matching MAC addresses")
@@ -569,9 +799,9 @@ class CheckCloudDirector(SourceBase):
 
     def get_object_based_on_primary_ip(self, object_type, primary_ip4=None, primary_ip6=None):
         """
-        Try to find a NBDevice or NBVM based on the primary IP address. If an exact
-        match was found the device/vm object will be returned immediately without
-        checking of the other primary IP address (if defined).
+        Try to find a NBDevice or NBVM based on the primary IP address using the primary IP
+        index of the inventory. If an exact match was found the device/vm object will be
+        returned immediately without checking of the other primary IP address (if defined).
 
         Parameters
         ----------
@@ -587,45 +817,19 @@ class CheckCloudDirector(SourceBase):
 
         """
 
-        def _matches_device_primary_ip(device_primary_ip, ip_needle):
-
-            ip = None
-            if device_primary_ip is not None and ip_needle is not None:
-                if isinstance(device_primary_ip, dict):
-                    ip = grab(device_primary_ip, "address")
-
-                elif isinstance(device_primary_ip, int):
-                    ip = self.inventory.get_by_id(NBIPAddress, nb_id=device_primary_ip)
-                    ip = grab(ip, "data.address")
-
-                if ip is not None and ip.split("/")[0] == ip_needle:
-                    return True
-
-            return False
-
         if object_type not in [NBDevice, NBVM]:
             raise ValueError(f"Object must be a '{NBVM.name}' or '{NBDevice.name}'.")
 
-        if primary_ip4 is None and primary_ip6 is None:
-            return
-
         if primary_ip4 is not None:
             primary_ip4 = str(primary_ip4).split("/")[0]
 
         if primary_ip6 is not None:
             primary_ip6 = str(primary_ip6).split("/")[0]
 
-        for device in self.inventory.get_all_items(object_type):
-
-            if _matches_device_primary_ip(grab(device, "data.primary_ip4"), primary_ip4) is True:
-                log.debug2(f"Found existing host '{device.get_display_name()}' "
-                           f"based on the primary IPv4 '{primary_ip4}'")
-                return device
-
-            if _matches_device_primary_ip(grab(device, "data.primary_ip6"), primary_ip6) is True:
-                log.debug2(f"Found existing host '{device.get_display_name()}' "
-                           f"based on the primary IPv6 '{primary_ip6}'")
-                return device
+        for device, ip_version in self.inventory.get_objects_by_primary_ip(object_type, primary_ip4, primary_ip6):
+            log.debug2(f"Found existing host '{device.get_display_name()}' "
+                       f"based on the primary IPv{ip_version} '{primary_ip4 if ip_version == 4 else primary_ip6}'")
+            return device
 
     def add_datacenter(self, obj):
         """
@@ -668,12 +872,9 @@ class CheckCloudDirector(SourceBase):
             return
 
         log.debug(f"Parsing vcloud VDC: {name}")
-        # need add filter
-        #if self.passes_filter(name, self.vdc_include_filter, self.vdc_exclude_filter) is False:
-        #    return
         
         site_name = self.get_site_name(NBCluster, name)       
-        log.debug(f"Try get '{self.vcloud_org}' site_relation for '{self.cluster_site_relation}'  is a '{site_name}'")
+        log.debug(f"Try get '{self.settings.vcloud_org}' site_relation for '{self.settings.cluster_site_relation}'  is a '{site_name}'")
 
         data = {
             "name": name,
@@ -691,43 +892,28 @@ class CheckCloudDirector(SourceBase):
         self.permitted_clusters[name] = site_name
     
 
-    def get_vcd_network(self, vnet_data: objectify.ObjectifiedElement):
-        
-        log.debug(f"Get prefix for Vcd Network....")
-        xmlRaw = etree.tostring(vnet_data)
-        vnet_dict = xmltodict.parse(xmlRaw)
-        subPrefix = vnet_dict.get('OrgVdcNetwork',{}).get('Configuration',{}).get('IpScopes',{}).get('IpScope',{}).get('SubnetPrefixLength',{})
-        gw = vnet_dict.get('OrgVdcNetwork',{}).get('Configuration',{}).get('IpScopes',{}).get('IpScope',{}).get('Gateway',{})   
-        name = vnet_dict.get('OrgVdcNetwork',{}).get('@name', None)         
-        #print(f"mask:{mask}")
-        network = IPv4Network(f"{gw}/{subPrefix}",strict=False)
-        
-        return network
-        #self.inventory.add_update_object(NBPrefix, data=data, source=self)
-    
-
-    def add_virtual_machine(self, vm_res, cluster_name):
+    def add_virtual_machine(self, vm_info, cluster_name, vdc_href=None):
         """
         Parse a VDC VM add to NetBox once all data is gathered.
 
         Parameters
         ----------
-        obj: 
-            virtual machine object to parse
+        vm_info: dict
+            VM data as returned by get_vm_data_from_resource or get_vm_data_from_record
+        cluster_name: str
+            name of the VDC the VM belongs to
+        vdc_href: str
+            href of the VDC the VM belongs to
         """
         log.debug(f"Get vm data ....")
-        vapp_vm = VM(self.vcloudClient, resource=vm_res)
-        #vmName = 
-        #allvm_org_list[vdc_name][vapp_name].append({
- 
 
         # check VM cluster
         if cluster_name is None:
             log.error(f"Requesting cluster for Virtual Machine in cluster '{cluster_name}' failed. Skipping.")
             return
         vm_data = {
-            'name'    : vm_res.attrib["name"], 
-            'status'  : "active" if vapp_vm.is_powered_on() else "offline",
+            'name'    : vm_info["name"],
+            'status'  : "active" if vm_info["powered_on"] else "offline",
             "cluster": {"name": cluster_name},
         }
         site_name = self.get_site_name(NBDevice, vm_data["name"], cluster_name)
@@ -741,37 +927,30 @@ class CheckCloudDirector(SourceBase):
 
         else:
             log.warning(f"can't find Site for VM: '{vm_data}'")
-        disk_size = 0
         tenant_name = self.get_object_relation(cluster_name, "cluster_tenant_relation")
         log.debug(f"Tenamt for VM: '{vm_data['name']}' is: '{tenant_name}'")
-        for hw_element in vapp_vm.list_virtual_hardware_section(is_disk=True):
-            vcpus = grab(hw_element,'cpuVirtualQuantity')
-            if vcpus:
-                vm_data['vcpus'] = int(vcpus) 
-            memory = grab(hw_element,'memoryVirtualQuantityInMb')
-            if memory:            
-                #log.debug(f"type of var memory: '{memory.pytype}'")
-                vm_data['memory'] = int(memory)
-            if grab(hw_element,'diskElementName'):
-                disk_size += grab(hw_element,'diskVirtualQuantityInBytes')
-            if tenant_name is not None:
-                vm_data["tenant"] = {"name": tenant_name}
+        if vm_info.get("vcpus"):
+            vm_data['vcpus'] = vm_info["vcpus"]
+        if vm_info.get("memory"):
+            vm_data['memory'] = vm_info["memory"]
+        if tenant_name is not None:
+            vm_data["tenant"] = {"name": tenant_name}
 
         # get disk size in GB
         p = math.pow(1024, 3)
-        vm_data['disk'] = round(disk_size / p)
+        vm_data['disk'] = round(vm_info["disk_size"] / p)
         # get vm platform Data
-        vm_data['platform'] = {"name": str(grab(vapp_vm.list_os_section(),'Description'))}
+        vm_data['platform'] = {"name": str(vm_info["platform"])}
         vm_primary_ip4 = None
         vm_nic_dict = dict()
         nic_ips = dict()       
-        for nic in vapp_vm.list_nics():
+        for nic in vm_info["nics"]:
             network = grab(nic,'network','.','Unknown')
             prefix = None
             #if nic_ips[network] is None:
             nic_ips[network] = list()
             ip_addr = grab(nic,'ip_address')
-            prefixNet = self.vdc_network_info.get(network,None)
+            prefixNet = self.network_catalog.get(network, vdc_href)
             if ip_addr is None:
                 log.debug(f"IP is None for '{nic}' Skeeping")
                 continue
@@ -796,7 +975,7 @@ class CheckCloudDirector(SourceBase):
                 "description": full_name,
                 "enabled": bool(grab(nic,'connected'))
             }
-            if ip_valid_to_add_to_netbox(ip_addr, self.permitted_subnets, self.excluded_subnets, full_name) is True:
+            if self.settings.permitted_subnets.permitted(ip_addr, interface_name=full_name) is True:
                 vm_nic_dict[network] = vm_nic_data
             else:
                 log.debug(f"Virtual machine '{vm_data['name']}' address '{ip_addr}' is not valid to add. Skipping")
@@ -1007,7 +1186,7 @@ class CheckCloudDirector(SourceBase):
                 # set/update/remove primary IP addresses
                 set_this_primary_ip = False
                 ip_version = ip_interface_object.ip.version
-                if self.set_primary_ip == "always":
+                if self.settings.set_primary_ip == "always":
 
                     for object_type in [NBDevice, NBVM]:
 
@@ -1015,22 +1194,19 @@ class CheckCloudDirector(SourceBase):
                         if ip_object.is_new is True:
                             break
 
-                        for devices_vms in self.inventory.get_all_items(object_type):
-
-                            # device has no primary IP of this version
-                            this_primary_ip = grab(devices_vms, f"data.primary_ip{ip_version}")
+                        # all devices/VMs which have the same object assigned
+                        for devices_vms in self.inventory.get_related_objects(object_type,
+                                                                              f"primary_ip{ip_version}", ip_object):
 
                             # we found this exact object
                             if devices_vms == device_vm_object:
                                 continue
 
-                            # device has the same object assigned
-                            if this_primary_ip == ip_object:
-                                devices_vms.unset_attribute(f"primary_ip{ip_version}")
+                            devices_vms.unset_attribute(f"primary_ip{ip_version}")
 
                     set_this_primary_ip = True
 
-                elif self.set_primary_ip != "never" and grab(device_vm_object, f"data.primary_ip{ip_version}") is None:
+                elif self.settings.set_primary_ip != "never" and grab(device_vm_object, f"data.primary_ip{ip_version}") is None:
                     set_this_primary_ip = True
 
                 if set_this_primary_ip is True:
@@ -1053,7 +1229,7 @@ class CheckCloudDirector(SourceBase):
         self.inventory.add_update_object(NBTag, data={
             "name": self.source_tag,
             "description": f"Marks objects synced from vCloud Director '{self.name}' "
-                           f"({self.vcloud_org}) to this NetBox Instance."
+                           f"({self.settings.vcloud_org}) to this NetBox Instance."
         })
 
         # update virtual site if present
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+from ipaddress import ip_network
+
+from module.common.logging import get_logger
+from module.common.misc import plural
+
+log = get_logger()
+
+
+class VCDNetworkCatalog:
+    """
+    IP networks of all org VDC networks (routed, isolated and direct) of an organization by VDC and network name.
+    Loaded once per run from orgVdcNetwork query records instead of requesting each network for each vApp.
+    """
+
+    def __init__(self):
+
+        # networks by (VDC href, network name)
+        self.networks = dict()
+
+        # networks by network name, only used if the network name is unique in the organization
+        self.networks_by_name = dict()
+
+        # lookup statistics of this run
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_network_from_record(network_record):
+        """
+        Return the IP network of an orgVdcNetwork query record
+
+        Parameters
+        ----------
+        network_record: objectify.ObjectifiedElement
+            orgVdcNetwork query record
+
+        Returns
+        -------
+        IPv4Network, IPv6Network, None: the network or None if the record contains no IP scope
+        """
+
+        gateway = network_record.get("defaultGateway")
+        prefix_length = network_record.get("subnetPrefixLength") or network_record.get("netmask")
+
+        if gateway is None or prefix_length is None:
+            return None
+
+        try:
+            return ip_network(f"{gateway}/{prefix_length}", strict=False)
+        except ValueError:
+            return None
+
+    def load(self, network_records):
+        """
+        Add all networks of a list of orgVdcNetwork query records
+
+        Parameters
+        ----------
+        network_records: list
+            orgVdcNetwork query records
+        """
+
+        for network_record in network_records:
+
+            name = network_record.get("name")
+            network = self.get_network_from_record(network_record)
+
+            if name is None or network is None:
+                continue
+
+            self.networks[(network_record.get("vdc"), name)] = network
+            self.networks_by_name.setdefault(name, set()).add(network)
+
+        log.debug(f"Loaded {len(self.networks)} org VDC network{plural(len(self.networks))}")
+
+    def get(self, name, vdc_href=None):
+        """
+        Return the IP network of an org VDC network
+
+        Parameters
+        ----------
+        name: str
+            name of the org VDC network
+        vdc_href: str
+            href of the VDC the network is used in
+
+        Returns
+        -------
+        IPv4Network, IPv6Network, None: the network or None if the network is unknown
+        """
+
+        network = self.networks.get((vdc_href, name))
+
+        # networks shared from another VDC, as long as the name is unambiguous
+        if network is None and len(self.networks_by_name.get(name, set())) == 1:
+            network = next(iter(self.networks_by_name[name]))
+
+        if network is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return network
+
+    def log_statistics(self):
+
+        log.debug(f"Org VDC network lookups: {self.hits} hit{plural(self.hits)}, "
+                  f"{self.misses} miss{'es' if self.misses != 1 else ''}")
+
+# EOF
@@ -373,6 +373,23 @@ class VMWareConfig(ConfigBase):
                          """,
                          config_example="VB_LAST_BACKUP, VB_LAST_BACKUP2"
                          ),
+            ConfigOption("incremental_sync",
+                         bool,
+                         description="""EXPERIMENTAL: only re-read VMs which changed since the previous run.
+                         The vCenter session, a PropertyCollector filter and its version are kept in the
+                         NetBox cache directory between runs. Requires NetBox caching to be enabled and
+                         the vCenter session idle timeout to be longer than the interval between two runs.
+                         Otherwise, all VMs will be read again. All VMs are also read again if the settings
+                         of this source changed. Assigning vCenter tags doesn't change a VM, tag changes of
+                         otherwise unchanged VMs ('vm_tag_source') are synced with the next full sync.
+                         """,
+                         default_value=False),
+            ConfigOption("full_sync_interval_in_hours",
+                         int,
+                         description="""if 'incremental_sync' is enabled, all VMs are read again
+                         once this number of hours passed since the last full sync.
+                         """,
+                         default_value=24),
 
             # removed settings
             ConfigOption("netbox_host_device_role",
@@ -8,6 +8,8 @@
 #  repository or visit: <https://opensource.org/licenses/MIT>.
 
 import datetime
+import hashlib
+import json
 import pprint
 import ssl
 from ipaddress import ip_address, ip_interface
@@ -28,6 +30,8 @@ from pyVmomi.VmomiSupport import VmomiJSONEncoder
 
 from module.sources.common.source_base import SourceBase
 from module.sources.vmware.config import VMWareConfig
+from module.sources.vmware.property_collector import VMWarePropertyCollector
+from module.sources.vmware.update_tracker import VMWareUpdateTracker
 from module.common.logging import get_logger, DEBUG3
 from module.common.misc import grab, dump, get_string_or_none, plural
 from module.common.support import normalize_mac_address
@@ -82,6 +86,8 @@ class VMWareHandler(SourceBase):
     # internal vars
     session = None
     tag_session = None
+    update_tracker = None
+    property_collector = None
 
     site_name = None
 
@@ -105,6 +111,23 @@ class VMWareHandler(SourceBase):
             log.info(f"Source '{name}' is currently disabled. Skipping")
             return
 
+        if self.settings.incremental_sync is True:
+            if self.inventory.cache_directory is None:
+                log.warning(f"Incremental sync for source '{name}' requires NetBox caching. "
+                            f"All objects will be read from vCenter.")
+            else:
+                # objects have to be read again if the settings of this source changed
+                source_settings = grab(settings_handler.config_content,
+                                       f"{settings_handler.section_name}|{self.name}", separator="|", fallback={})
+                settings_hash = hashlib.sha256(json.dumps(
+                    {k: v for k, v in source_settings.items() if k != "password"}, sort_keys=True, default=str
+                ).encode("utf-8")).hexdigest()
+
+                self.update_tracker = VMWareUpdateTracker(self.inventory.cache_directory, self.name,
+                                                          self.settings.host_fqdn,
+                                                          self.settings.full_sync_interval_in_hours,
+                                                          settings_hash)
+
         self._sdk_instance = None
         self.create_sdk_session()
 
@@ -132,6 +155,14 @@ class VMWareHandler(SourceBase):
         self.objects_to_reevaluate = list()
         self.parsing_objects_to_reevaluate = False
 
+        # objects with all properties used by the view handlers by view type
+        self.retrieved_objects = dict()
+
+        # vCenter tags, retrieved once per run
+        self.vmware_tag_definitions = dict()
+        self.vmware_object_tag_ids = dict()
+        self.vmware_object_tags = dict()
+
     def create_sdk_session(self):
         """
         Initialize SDK session with vCenter
@@ -151,6 +182,15 @@ class VMWareHandler(SourceBase):
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
 
+        # the update filter of the previous run only exists in the session of the previous run
+        if self.update_tracker is not None and self.update_tracker.session_cookie is not None:
+            self._sdk_instance = self.resume_sdk_session(ssl_context)
+
+            if self._sdk_instance is not None:
+                self.session = self._sdk_instance.RetrieveContent()
+                log.info(f"Successfully resumed vCenter SDK session with '{self.settings.host_fqdn}'")
+                return True
+
         connection_params = dict(
             host=self.settings.host_fqdn,
             port=self.settings.port,
@@ -200,6 +240,47 @@ class VMWareHandler(SourceBase):
 
         return True
 
+    def resume_sdk_session(self, ssl_context):
+        """
+        Try to continue the vCenter SDK session of the previous run using the saved session cookie
+
+        Parameters
+        ----------
+        ssl_context: ssl.SSLContext
+            SSL context used to connect to vCenter
+
+        Returns
+        -------
+        vim.ServiceInstance, None: the service instance if the session is still valid, None otherwise
+        """
+
+        connection_params = dict(
+            host=self.settings.host_fqdn,
+            port=self.settings.port,
+            sslContext=ssl_context
+        )
+
+        if self.settings.proxy_host is not None and self.settings.proxy_port is not None:
+            connection_params.update(
+                httpProxyHost=self.settings.proxy_host,
+                httpProxyPort=self.settings.proxy_port,
+            )
+
+        try:
+            smart_stub = connect.SmartStubAdapter(**connection_params)
+            smart_stub.cookie = self.update_tracker.session_cookie
+            sdk_instance = vim.ServiceInstance('ServiceInstance', smart_stub)
+
+            if sdk_instance.RetrieveContent().sessionManager.currentSession is None:
+                log.debug("vCenter SDK session of the previous run expired")
+                return None
+
+        except Exception as e:
+            log.debug(f"Unable to resume vCenter SDK session of the previous run: {e}")
+            return None
+
+        return sdk_instance
+
     def create_api_session(self):
         """
         Initialize API session with vCenter
@@ -260,10 +341,105 @@ class VMWareHandler(SourceBase):
 
         return True
 
+    def save_update_state(self):
+        """
+        Save the update state of this run to read only changed VMs during the next run
+
+        Returns
+        -------
+        bool: True if the state has been saved and the SDK session has to be kept open
+        """
+
+        object_ids = dict(self.update_tracker.unchanged_objects)
+
+        # VMs which couldn't be created in NetBox are stored with ID 0 and read again next run
+        for managed_object_id, nb_object in (self.object_cache.get(vim.VirtualMachine.__name__) or dict()).items():
+            if isinstance(nb_object, NBVM):
+                object_ids[managed_object_id] = max(nb_object.nb_id, 0)
+
+        # noinspection PyProtectedMember
+        session_cookie = grab(self._sdk_instance, "_stub.cookie")
+
+        if self.update_tracker.save(session_cookie, object_ids) is False:
+            return False
+
+        log.debug(f"Saved vCenter update state for {len(object_ids)} virtual machine{plural(len(object_ids))}")
+
+        return True
+
+    def adopt_unchanged_virtual_machines(self, vm_list, property_paths):
+        """
+        Take over the NetBox objects of all VMs which didn't change since the previous run,
+        including their interfaces, IP addresses and disks. VMs which don't exist in NetBox
+        anymore or haven't been created in NetBox during the previous run are retrieved again.
+
+        Parameters
+        ----------
+        vm_list: list
+            VMs which changed since the previous run
+        property_paths: list
+            VM property paths to retrieve
+
+        Returns
+        -------
+        list, None: of VMWareObject, None if retrieving missing VMs failed
+        """
+
+        missing_vm_ids = list()
+        for managed_object_id, nb_id in self.update_tracker.unchanged_objects.items():
+
+            vm_object = None
+            if nb_id > 0:
+                vm_object = self.inventory.get_by_id(NBVM, nb_id=nb_id)
+
+            # VM has been deleted in NetBox or creating it failed in the previous run
+            if vm_object is None:
+                missing_vm_ids.append(managed_object_id)
+                continue
+
+            vm_object.set_source(self)
+            for interface_object in self.inventory.get_all_interfaces(vm_object):
+                interface_object.set_source(self)
+                for ip_object in interface_object.get_ip_addresses():
+                    ip_object.set_source(self)
+
+            for disk_object in vm_object.get_virtual_disks():
+                disk_object.set_source(self)
+
+        for managed_object_id in missing_vm_ids:
+            del self.update_tracker.unchanged_objects[managed_object_id]
+
+        log.info(f"Keeping {len(self.update_tracker.unchanged_objects)} unchanged "
+                 f"virtual machine{plural(len(self.update_tracker.unchanged_objects))} of the previous run")
+
+        if len(missing_vm_ids) > 0:
+            log.debug(f"{len(missing_vm_ids)} unchanged virtual machine{plural(len(missing_vm_ids))} "
+                      f"not found in NetBox, reading them again")
+
+            # noinspection PyProtectedMember
+            stub = self.session.propertyCollector._stub
+            missing_vm_list = self.property_collector.retrieve_objects(
+                vim.VirtualMachine, [vim.VirtualMachine(x, stub) for x in missing_vm_ids], property_paths
+            )
+
+            if missing_vm_list is None:
+                return None
+
+            self.prefetch_vmware_object_tags(vim.VirtualMachine, missing_vm_list)
+
+            vm_list = vm_list + missing_vm_list
+
+        return vm_list
+
     def finish(self):
 
+        # keep SDK session open to use the update filter during the next run
+        keep_sdk_session = False
+        if self.update_tracker is not None and self._sdk_instance is not None:
+            keep_sdk_session = self.save_update_state()
+
         # closing tag session
-        if self._sdk_instance is not None:
+        if self._sdk_instance is not None and keep_sdk_session is False:
             try:
                 connect.Disconnect(self._sdk_instance)
             except Exception as e:
@@ -276,16 +452,7 @@ class VMWareHandler(SourceBase):
             except Exception as e:
                 log.error(f"unable to close vCenter API instance connection: {e}")
 
-    def apply(self):
-        """
-        Main source handler method. This method is called for each source from "main" program
-        to retrieve data from it source and apply it to the NetBox inventory.
-
-        Every update of new/existing objects fot this source has to happen here.
-        """
-
-        log.info(f"Query data from vCenter: '{self.settings.host_fqdn}'")
-
+    def get_object_mapping(self):
         """
         Mapping of object type keywords to view types and handlers
 
@@ -308,42 +475,134 @@ class VMWareHandler(SourceBase):
             },
 
         """
+        custom_value_properties = list()
+        if self.settings.sync_custom_attributes is True:
+            custom_value_properties = ["customValue"]
+
+        host_properties = [
+            "name", "parent", "summary", "availableField",
+            "config.network.vswitch", "config.network.proxySwitch", "config.network.portgroup",
+            "config.network.pnic", "config.network.vnic"
+        ] + custom_value_properties
+
+        vm_properties = [
+            "name", "parent", "availableField", "runtime.host", "runtime.powerState",
+            "config.instanceUuid", "config.template", "config.managedBy", "config.guestFullName",
+            "config.annotation", "config.hardware.device", "config.hardware.memoryMB", "config.hardware.numCPU",
+            "guest.guestFullName", "guest.net", "guest.ipStack"
+        ] + custom_value_properties
+
         object_mapping = {
+            "folder": {
+                "view_type": vim.Folder,
+                "properties": ["name", "parent"]
+            },
             "datacenter": {
                 "view_type": vim.Datacenter,
-                "view_handler": self.add_datacenter
+                "view_handler": self.add_datacenter,
+                "properties": ["name", "parent"]
             },
             "cluster": {
                 "view_type": vim.ClusterComputeResource,
-                "view_handler": self.add_cluster
+                "view_handler": self.add_cluster,
+                "properties": ["name", "parent"]
             },
             "single host cluster": {
                 "view_type": vim.ComputeResource,
-                "view_handler": self.add_cluster
+                "view_handler": self.add_cluster,
+                "properties": ["name", "parent"]
             },
             "network": {
                 "view_type": vim.dvs.DistributedVirtualPortgroup,
-                "view_handler": self.add_port_group
+                "view_handler": self.add_port_group,
+                "properties": ["key", "name", "config.defaultPortConfig"]
             },
             "host": {
                 "view_type": vim.HostSystem,
-                "view_handler": self.add_host
+                "view_handler": self.add_host,
+                "properties": host_properties
             },
             "virtual machine": {
                 "view_type": vim.VirtualMachine,
-                "view_handler": self.add_virtual_machine
+                "view_handler": self.add_virtual_machine,
+                "properties": vm_properties
             },
             "offline virtual machine": {
                 "view_type": vim.VirtualMachine,
-                "view_handler": self.add_virtual_machine
+                "view_handler": self.add_virtual_machine,
+                "properties": vm_properties
             }
         }
 
         # skip virtual machines which are reported offline
         if self.settings.skip_offline_vms is True:
-            log.info("Skipping offline VMs")
             del object_mapping["offline virtual machine"]
 
+        return object_mapping
+
+    def retrieve_view_objects(self, view_type, property_paths):
+        """
+        Retrieve all objects of a view type with the properties used by the view handlers
+        with a few requests per type. Objects are only retrieved once per session.
+
+        Parameters
+        ----------
+        view_type: pyVmomi managed object type
+            type of the objects to retrieve
+        property_paths: list
+            property paths to retrieve
+
+        Returns
+        -------
+        list, None: of VMWareObject, None if retrieving the objects failed
+        """
+
+        if self.property_collector is None:
+            self.property_collector = VMWarePropertyCollector(self.session)
+            self.retrieved_objects = dict()
+
+        if view_type in self.retrieved_objects:
+            return self.retrieved_objects[view_type]
+
+        view_objects = None
+        if view_type == vim.VirtualMachine and self.update_tracker is not None:
+            view_objects = self.update_tracker.get_objects(self.property_collector, view_type, property_paths)
+
+        if view_objects is None:
+            view_objects = self.property_collector.retrieve(view_type, property_paths)
+
+        self.prefetch_vmware_object_tags(view_type, view_objects)
+
+        self.retrieved_objects[view_type] = view_objects
+
+        return view_objects
+
+    def collect(self):
+        """
+        Retrieve all objects from vCenter without touching the NetBox inventory.
+        This is called for all sources in parallel before apply().
+        """
+
+        log.info(f"Retrieving data from vCenter: '{self.settings.host_fqdn}'")
+
+        for view_details in self.get_object_mapping().values():
+            self.retrieve_view_objects(view_details.get("view_type"), view_details.get("properties"))
+
+    def apply(self):
+        """
+        Main source handler method. This method is called for each source from "main" program
+        to retrieve data from it source and apply it to the NetBox inventory.
+
+        Every update of new/existing objects fot this source has to happen here.
+        """
+
+        log.info(f"Query data from vCenter: '{self.settings.host_fqdn}'")
+
+        object_mapping = self.get_object_mapping()
+
+        if self.settings.skip_offline_vms is True:
+            log.info("Skipping offline VMs")
+
         for view_name, view_details in object_mapping.items():
 
             # test if session is still alive
@@ -355,29 +614,48 @@ class VMWareHandler(SourceBase):
                 self.tag_session = None
                 self.create_sdk_session()
                 self.create_api_session()
+                self.property_collector = None
 
             if self.session is None:
                 log.error("Recreating session failed")
                 break
 
-            view_data = {
-                "container": self.session.rootFolder,
-                "type": [view_details.get("view_type")],
-                "recursive": True
-            }
+            view_type = view_details.get("view_type")
 
-            try:
-                container_view = self.session.viewManager.CreateContainerView(**view_data)
-            except Exception as e:
-                log.error(f"Problem creating vCenter view for '{view_name}s': {e}")
-                continue
+            container_view = None
+            view_objects = self.retrieve_view_objects(view_type, view_details.get("properties"))
 
-            view_objects = grab(container_view, "view")
+            # take over unchanged VMs of the previous run before processing changed VMs
+            if view_name == "virtual machine" and view_objects is not None and \
+                    self.update_tracker is not None and self.update_tracker.full_sync is False:
+                view_objects = self.adopt_unchanged_virtual_machines(view_objects, view_details.get("properties"))
+                self.retrieved_objects[view_type] = view_objects
 
-            if view_objects is None:
-                log.error(f"Creating vCenter view for '{view_name}s' failed!")
+            # folders are only retrieved to resolve parent objects
+            if view_details.get("view_handler") is None:
                 continue
 
+            # fall back to reading the properties of each object separately
+            if view_objects is None:
+
+                view_data = {
+                    "container": self.session.rootFolder,
+                    "type": [view_type],
+                    "recursive": True
+                }
+
+                try:
+                    container_view = self.session.viewManager.CreateContainerView(**view_data)
+                except Exception as e:
+                    log.error(f"Problem creating vCenter view for '{view_name}s': {e}")
+                    continue
+
+                view_objects = grab(container_view, "view")
+
+                if view_objects is None:
+                    log.error(f"Creating vCenter view for '{view_name}s' failed!")
+                    continue
+
             if view_name != "offline virtual machine":
                 log.debug("vCenter returned '%d' %s%s" % (len(view_objects), view_name, plural(len(view_objects))))
             else:
@@ -395,7 +673,8 @@ class VMWareHandler(SourceBase):
                 # noinspection PyArgumentList
                 view_details.get("view_handler")(obj)
 
-            container_view.Destroy()
+            if container_view is not None:
+                container_view.Destroy()
 
         self.parsing_objects_to_reevaluate = True
         log.info("Parsing objects which were marked to be reevaluated")
@@ -492,8 +771,8 @@ class VMWareHandler(SourceBase):
         """
         Try to find a NetBox object based on list of MAC addresses.
 
-        Iterate over all interfaces of this object type and compare MAC address with list of desired MAC
-        addresses. If match was found store related machine object and count every correct match.
+        Look up all interfaces of this object type with a MAC address of the list of desired MAC
+        addresses in the MAC address index of the inventory and count matching interfaces per machine.
 
         If exactly one machine with matching interfaces was found then this one will be returned.
 
@@ -526,38 +805,18 @@ class VMWareHandler(SourceBase):
         if mac_list is None or not isinstance(mac_list, list) or len(mac_list) == 0:
             return
 
-        interface_typ = NBInterface if object_type == NBDevice else NBVMInterface
-
-        objects_with_matching_macs = dict()
-        matching_object = None
-
-        for interface in self.inventory.get_all_items(interface_typ):
-
-            if grab(interface, "data.mac_address") in mac_list:
-
-                matching_object = grab(interface, f"data.{interface.secondary_key}")
-                if not isinstance(matching_object, (NBDevice, NBVM)):
-                    continue
-
-                log.debug2("Found matching MAC '%s' on %s '%s'" %
-                           (grab(interface, "data.mac_address"), object_type.name,
-                            matching_object.get_display_name(including_second_key=True)))
-
-                if objects_with_matching_macs.get(matching_object) is None:
-                    objects_with_matching_macs[matching_object] = 1
-                else:
-                    objects_with_matching_macs[matching_object] += 1
+        objects_with_matching_macs = self.inventory.count_matching_macs(object_type, mac_list)
 
         # try to find object based on amount of matching MAC addresses
         num_devices_witch_matching_macs = len(objects_with_matching_macs.keys())
 
-        if num_devices_witch_matching_macs == 1 and isinstance(matching_object, (NBDevice, NBVM)):
-
-            log.debug2("Found one %s '%s' based on MAC addresses and using it" %
-                       (object_type.name, matching_object.get_display_name(including_second_key=True)))
+        if num_devices_witch_matching_macs == 1:
 
             object_to_return = list(objects_with_matching_macs.keys())[0]
 
+            log.debug2("Found one %s '%s' based on MAC addresses and using it" %
+                       (object_type.name, object_to_return.get_display_name(including_second_key=True)))
+
         elif num_devices_witch_matching_macs > 1:
 
             log.debug2(f"Found {num_devices_witch_matching_macs} {object_type.name}s with matching MAC addresses")
@@ -588,9 +847,9 @@ class VMWareHandler(SourceBase):
 
     def get_object_based_on_primary_ip(self, object_type, primary_ip4=None, primary_ip6=None):
         """
-        Try to find a NBDevice or NBVM based on the primary IP address. If an exact
-        match was found the device/vm object will be returned immediately without
-        checking of the other primary IP address (if defined).
+        Try to find a NBDevice or NBVM based on the primary IP address using the primary IP
+        index of the inventory. If an exact match was found the device/vm object will be
+        returned immediately without checking of the other primary IP address (if defined).
 
         Parameters
         ----------
@@ -606,45 +865,117 @@ class VMWareHandler(SourceBase):
 
         """
 
-        def _matches_device_primary_ip(device_primary_ip, ip_needle):
+        if object_type not in [NBDevice, NBVM]:
+            raise ValueError(f"Object must be a '{NBVM.name}' or '{NBDevice.name}'.")
+
+        if primary_ip4 is not None:
+            primary_ip4 = str(primary_ip4).split("/")[0]
+
+        if primary_ip6 is not None:
+            primary_ip6 = str(primary_ip6).split("/")[0]
 
-            ip = None
-            if device_primary_ip is not None and ip_needle is not None:
-                if isinstance(device_primary_ip, dict):
-                    ip = grab(device_primary_ip, "address")
+        for device, ip_version in self.inventory.get_objects_by_primary_ip(object_type, primary_ip4, primary_ip6):
+            log.debug2(f"Found existing host '{device.get_display_name()}' "
+                       f"based on the primary IPv{ip_version} '{primary_ip4 if ip_version == 4 else primary_ip6}'")
+            return device
 
-                elif isinstance(device_primary_ip, int):
-                    ip = self.inventory.get_by_id(NBIPAddress, nb_id=device_primary_ip)
-                    ip = grab(ip, "data.address")
+    def prefetch_vmware_object_tags(self, view_type, view_objects):
+        """
+        Retrieve the tags attached to all objects of a view with a few bulk requests
+        if tags of this object type are used by any tag source.
 
-                if ip is not None and ip.split("/")[0] == ip_needle:
-                    return True
+        Parameters
+        ----------
+        view_type: pyVmomi managed object type
+            type of the objects in this view
+        view_objects: list
+            pyvmomi objects to retrieve tags for
+        """
 
-            return False
+        if self.tag_session is None or not view_objects:
+            return
 
-        if object_type not in [NBDevice, NBVM]:
-            raise ValueError(f"Object must be a '{NBVM.name}' or '{NBDevice.name}'.")
+        def tag_source_used(tag_source_name, *tag_sources):
+            return any(tag_source_name in (x or list()) for x in tag_sources)
+
+        all_tag_sources = [self.settings.cluster_tag_source, self.settings.host_tag_source, self.settings.vm_tag_source]
+
+        if view_type == vim.Folder:
+            tags_used = tag_source_used("parent_folder_1", *all_tag_sources) or \
+                        tag_source_used("parent_folder_2", *all_tag_sources)
+        elif view_type == vim.Datacenter:
+            tags_used = tag_source_used("datacenter", *all_tag_sources)
+        elif view_type in [vim.ClusterComputeResource, vim.ComputeResource]:
+            tags_used = tag_source_used("object", self.settings.cluster_tag_source) or \
+                        tag_source_used("cluster", self.settings.host_tag_source, self.settings.vm_tag_source)
+        elif view_type == vim.HostSystem:
+            tags_used = tag_source_used("object", self.settings.host_tag_source)
+        elif view_type == vim.VirtualMachine:
+            tags_used = tag_source_used("object", self.settings.vm_tag_source)
+        else:
+            tags_used = False
 
-        if primary_ip4 is None and primary_ip6 is None:
+        if tags_used is False:
             return
 
-        if primary_ip4 is not None:
-            primary_ip4 = str(primary_ip4).split("/")[0]
+        object_ids = dict()
+        for obj in view_objects:
+            object_id = grab(obj, "_moId")
+            if object_id is not None and object_id not in self.vmware_object_tag_ids:
+                object_ids[object_id] = DynamicID(type=grab(obj, "_wsdlName"), id=object_id)
 
-        if primary_ip6 is not None:
-            primary_ip6 = str(primary_ip6).split("/")[0]
+        # number of objects per request
+        chunk_size = 500
+        object_id_list = list(object_ids.keys())
+        number_of_requests = 0
+
+        for offset in range(0, len(object_id_list), chunk_size):
 
-        for device in self.inventory.get_all_items(object_type):
+            object_id_chunk = object_id_list[offset:offset + chunk_size]
+            try:
+                attached_tags = self.tag_session.tagging.TagAssociation.list_attached_tags_on_objects(
+                    [object_ids[x] for x in object_id_chunk])
+            except Exception as e:
+                log.error(f"Unable to retrieve vCenter tags for '{view_type.__name__}' objects: {e}")
+                return
 
-            if _matches_device_primary_ip(grab(device, "data.primary_ip4"), primary_ip4) is True:
-                log.debug2(f"Found existing host '{device.get_display_name()}' "
-                           f"based on the primary IPv4 '{primary_ip4}'")
-                return device
+            number_of_requests += 1
 
-            if _matches_device_primary_ip(grab(device, "data.primary_ip6"), primary_ip6) is True:
-                log.debug2(f"Found existing host '{device.get_display_name()}' "
-                           f"based on the primary IPv6 '{primary_ip6}'")
-                return device
+            for object_id in object_id_chunk:
+                self.vmware_object_tag_ids[object_id] = list()
+
+            for object_tags in attached_tags:
+                self.vmware_object_tag_ids[grab(object_tags, "object_id.id")] = list(object_tags.tag_ids or list())
+
+        log.debug2(f"Retrieved vCenter tags of {len(object_id_list)} '{view_type.__name__}' "
+                   f"object{plural(len(object_id_list))} with {number_of_requests} "
+                   f"request{plural(number_of_requests)}")
+
+    def get_vmware_tag(self, tag_id):
+        """
+        Return name and description of a vCenter tag. Each tag is only requested once per run.
+
+        Parameters
+        ----------
+        tag_id: str
+            ID of the vCenter tag
+
+        Returns
+        -------
+        tuple, None: name and description of the tag, None if the tag could not be retrieved
+        """
+
+        if tag_id not in self.vmware_tag_definitions:
+
+            # noinspection PyBroadException
+            try:
+                tag = self.tag_session.tagging.Tag.get(tag_id)
+                self.vmware_tag_definitions[tag_id] = (tag.name, tag.description)
+            except Exception as e:
+                log.error(f"Unable to retrieve vCenter tag '{tag_id}': {e}")
+                self.vmware_tag_definitions[tag_id] = None
+
+        return self.vmware_tag_definitions[tag_id]
 
     def get_vmware_object_tags(self, obj):
         """
@@ -663,27 +994,35 @@ class VMWareHandler(SourceBase):
         if obj is None:
             return
 
+        object_id = grab(obj, "_moId")
+
+        # tags of folders and clusters are requested for each host and VM
+        if object_id in self.vmware_object_tags:
+            return list(self.vmware_object_tags[object_id])
+
         tag_list = list()
         if self.tag_session is not None:
 
-            # noinspection PyBroadException
-            try:
-                object_tag_ids = self.tag_session.tagging.TagAssociation.list_attached_tags(
-                    DynamicID(type=grab(obj, "_wsdlName"), id=grab(obj, "_moId")))
-            except Exception as e:
-                log.error(f"Unable to retrieve vCenter tags for '{obj.name}': {e}")
-                return
-
-            for tag_id in object_tag_ids:
+            object_tag_ids = self.vmware_object_tag_ids.get(object_id)
 
+            # tags of this object have not been retrieved in bulk
+            if object_tag_ids is None:
                 # noinspection PyBroadException
                 try:
-                    tag_name = self.tag_session.tagging.Tag.get(tag_id).name
-                    tag_description = self.tag_session.tagging.Tag.get(tag_id).description
+                    object_tag_ids = self.tag_session.tagging.TagAssociation.list_attached_tags(
+                        DynamicID(type=grab(obj, "_wsdlName"), id=object_id))
                 except Exception as e:
-                    log.error(f"Unable to retrieve vCenter tag '{tag_id}' for '{obj.name}': {e}")
+                    log.error(f"Unable to retrieve vCenter tags for '{obj.name}': {e}")
+                    return
+
+            for tag_id in object_tag_ids:
+
+                tag = self.get_vmware_tag(tag_id)
+                if tag is None:
                     continue
 
+                tag_name, tag_description = tag
+
                 if tag_name is not None:
 
                     if tag_description is not None and len(f"{tag_description}") > 0:
@@ -696,7 +1035,10 @@ class VMWareHandler(SourceBase):
                         "description": tag_description
                     }))
 
-        return tag_list
+        if object_id is not None:
+            self.vmware_object_tags[object_id] = tag_list
+
+        return list(tag_list)
 
     def collect_object_tags(self, obj):
         """
@@ -1202,18 +1544,15 @@ class VMWareHandler(SourceBase):
                         if ip_object.is_new is True:
                             break
 
-                        for devices_vms in self.inventory.get_all_items(object_type):
-
-                            # device has no primary IP of this version
-                            this_primary_ip = grab(devices_vms, f"data.primary_ip{ip_version}")
+                        # all devices/VMs which have the same object assigned
+                        for devices_vms in self.inventory.get_related_objects(object_type,
+                                                                              f"primary_ip{ip_version}", ip_object):
 
                             # we found this exact object
                             if devices_vms == device_vm_object:
                                 continue
 
-                            # device has the same object assigned
-                            if this_primary_ip == ip_object:
-                                devices_vms.unset_attribute(f"primary_ip{ip_version}")
+                            devices_vms.unset_attribute(f"primary_ip{ip_version}")
 
                     set_this_primary_ip = True
 
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+# noinspection PyUnresolvedReferences
+from pyVmomi import vim, vmodl
+
+from module.common.logging import get_logger
+from module.common.misc import plural
+
+log = get_logger()
+
+
+class VMWarePropertyPaths:
+    """
+    The set of property paths which have been retrieved for an object type.
+    Shared by all objects of this type.
+    """
+
+    __slots__ = ("paths", "prefixes")
+
+    def __init__(self, paths):
+
+        self.paths = frozenset(paths)
+
+        prefixes = set()
+        for path in self.paths:
+            path_elements = path.split(".")
+            for i in range(1, len(path_elements)):
+                prefixes.add(".".join(path_elements[0:i]))
+
+        self.prefixes = frozenset(prefixes)
+
+
+class VMWareObject:
+    """
+    Lightweight stand-in for a vCenter managed object which returns properties retrieved
+    by the PropertyCollector without any further requests to vCenter.
+
+    Attributes are resolved like on the managed object itself, i.e. 'obj.config.hardware.device'.
+    References to other managed objects are replaced with their VMWareObject if the referenced
+    object has been retrieved as well. Attributes which have not been retrieved are read from the
+    managed object, which results in a request to vCenter.
+
+    isinstance() checks against pyVmomi types work as for the managed object itself.
+    """
+
+    __slots__ = ("_managed_object", "_properties", "_property_paths", "_prefix", "_collector")
+
+    def __init__(self, managed_object, properties, property_paths, collector, prefix=""):
+
+        self._managed_object = managed_object
+        self._properties = properties
+        self._property_paths = property_paths
+        self._collector = collector
+        self._prefix = prefix
+
+    @property
+    def __class__(self):
+        if self._prefix == "":
+            return self._managed_object.__class__
+        return VMWareObject
+
+    def __getattr__(self, name):
+
+        path = f"{self._prefix}{name}"
+
+        if path in self._property_paths.paths:
+            return self._collector.resolve(self._properties.get(path))
+
+        if path in self._property_paths.prefixes:
+            return VMWareObject(self._managed_object, self._properties, self._property_paths,
+                                self._collector, prefix=f"{path}.")
+
+        # property has not been retrieved, get it from the managed object
+        value = self._managed_object
+        for attribute in path.split("."):
+            value = getattr(value, attribute)
+
+        return value
+
+    def __eq__(self, other):
+
+        if isinstance(other, VMWareObject):
+            # noinspection PyProtectedMember
+            other = other._managed_object
+
+        return self._prefix == "" and self._managed_object == other
+
+    def __hash__(self):
+
+        return hash(self._managed_object)
+
+    def __repr__(self):
+
+        return f"<VMWareObject '{self._prefix}' of {self._managed_object}>"
+
+
+class VMWarePropertyCollector:
+    """
+    Retrieves selected properties of all managed objects of a type with
+    PropertyCollector.RetrievePropertiesEx using a few paged requests instead of
+    reading each property of each object with a separate request.
+    """
+
+    # maximum number of objects returned by vCenter with a single response
+    max_objects_per_page = 1000
+
+    def __init__(self, session):
+        """
+        Parameters
+        ----------
+        session: vim.ServiceInstanceContent
+            content of the vCenter SDK session
+        """
+
+        self.session = session
+
+        # all retrieved objects by managed object ID
+        self.objects = dict()
+
+    def resolve(self, value):
+        """
+        Replace a reference to a managed object with the VMWareObject of this managed object
+
+        Parameters
+        ----------
+        value: any
+            property value
+
+        Returns
+        -------
+        VMWareObject, any: the VMWareObject if the object has been retrieved, otherwise the value itself
+        """
+
+        if isinstance(value, vmodl.ManagedObject):
+            # noinspection PyProtectedMember
+            return self.objects.get(value._GetMoId(), value)
+
+        return value
+
+    def add_object(self, managed_object, properties, property_paths):
+        """
+        Add a managed object with its retrieved properties to the registry
+
+        Parameters
+        ----------
+        managed_object: vmodl.ManagedObject
+            the managed object the properties belong to
+        properties: dict
+            property values by property path
+        property_paths: VMWarePropertyPaths
+            property paths which have been retrieved for this object type
+
+        Returns
+        -------
+        VMWareObject: the new object
+        """
+
+        this_object = VMWareObject(managed_object, properties, property_paths, self)
+
+        # noinspection PyProtectedMember
+        self.objects[managed_object._GetMoId()] = this_object
+
+        return this_object
+
+    @staticmethod
+    def get_filter_spec(object_type, property_paths, container_view=None, managed_objects=None):
+        """
+        Return a filter spec selecting properties of all objects in a container view
+        or of a list of managed objects
+
+        Parameters
+        ----------
+        object_type: pyVmomi managed object type
+            type of the objects to retrieve, i.e. vim.HostSystem
+        property_paths: list
+            property paths to retrieve, i.e. "config.hardware.device"
+        container_view: vim.view.ContainerView
+            view containing the objects
+        managed_objects: list
+            managed objects to retrieve, used if no container_view is defined
+
+        Returns
+        -------
+        vmodl.query.PropertyCollector.FilterSpec: the filter spec
+        """
+
+        if container_view is not None:
+            object_set = [vmodl.query.PropertyCollector.ObjectSpec(
+                obj=container_view,
+                skip=True,
+                selectSet=[vmodl.query.PropertyCollector.TraversalSpec(
+                    name="traverseView",
+                    path="view",
+                    skip=False,
+                    type=vim.view.ContainerView
+                )]
+            )]
+        else:
+            object_set = [vmodl.query.PropertyCollector.ObjectSpec(obj=x, skip=False)
+                          for x in managed_objects or list()]
+
+        property_spec = vmodl.query.PropertyCollector.PropertySpec(
+            type=object_type,
+            all=False,
+            pathSet=list(property_paths)
+        )
+
+        return vmodl.query.PropertyCollector.FilterSpec(objectSet=object_set, propSet=[property_spec])
+
+    def retrieve(self, object_type, property_paths):
+        """
+        Retrieve properties of all objects of a type
+
+        Parameters
+        ----------
+        object_type: pyVmomi managed object type
+            type of the objects to retrieve, i.e. vim.HostSystem
+        property_paths: list
+            property paths to retrieve, i.e. "config.hardware.device"
+
+        Returns
+        -------
+        list, None: of VMWareObject, None if retrieving properties failed
+        """
+
+        try:
+            container_view = self.session.viewManager.CreateContainerView(
+                container=self.session.rootFolder, type=[object_type], recursive=True
+            )
+        except Exception as e:
+            log.error(f"Problem creating vCenter view for '{object_type.__name__}' objects: {e}")
+            return None
+
+        try:
+            return self.retrieve_by_filter_spec(
+                object_type, property_paths,
+                self.get_filter_spec(object_type, property_paths, container_view=container_view)
+            )
+
+        finally:
+            # noinspection PyBroadException
+            try:
+                container_view.Destroy()
+            except Exception:
+                pass
+
+    def retrieve_objects(self, object_type, managed_objects, property_paths):
+        """
+        Retrieve properties of a list of managed objects
+
+        Parameters
+        ----------
+        object_type: pyVmomi managed object type
+            type of the objects to retrieve, i.e. vim.VirtualMachine
+        managed_objects: list
+            managed objects of this type
+        property_paths: list
+            property paths to retrieve, i.e. "config.hardware.device"
+
+        Returns
+        -------
+        list, None: of VMWareObject, None if retrieving properties failed
+        """
+
+        if len(managed_objects) == 0:
+            return list()
+
+        return self.retrieve_by_filter_spec(
+            object_type, property_paths,
+            self.get_filter_spec(object_type, property_paths, managed_objects=managed_objects)
+        )
+
+    def retrieve_by_filter_spec(self, object_type, property_paths, filter_spec):
+        """
+        Retrieve properties of all objects selected by a filter spec with paged requests
+
+        Parameters
+        ----------
+        object_type: pyVmomi managed object type
+            type of the objects to retrieve, i.e. vim.HostSystem
+        property_paths: list
+            property paths selected by the filter spec
+        filter_spec: vmodl.query.PropertyCollector.FilterSpec
+            filter spec to retrieve
+
+        Returns
+        -------
+        list, None: of VMWareObject, None if retrieving properties failed
+        """
+
+        property_collector = self.session.propertyCollector
+        options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=self.max_objects_per_page)
+
+        paths = VMWarePropertyPaths(property_paths)
+        object_list = list()
+        number_of_requests = 1
+
+        try:
+            result = property_collector.RetrievePropertiesEx(specSet=[filter_spec], options=options)
+
+            while result is not None:
+
+                for object_content in result.objects:
+                    object_list.append(
+                        self.add_object(object_content.obj, {x.name: x.val for x in object_content.propSet}, paths)
+                    )
+
+                if result.token is None:
+                    break
+
+                result = property_collector.ContinueRetrievePropertiesEx(token=result.token)
+                number_of_requests += 1
+
+        except Exception as e:
+            log.error(f"Retrieving properties of '{object_type.__name__}' objects from vCenter failed: {e}")
+            return None
+
+        log.debug2(f"Retrieved {len(object_list)} '{object_type.__name__}' object{plural(len(object_list))} "
+                   f"with {number_of_requests} request{plural(number_of_requests)}")
+
+        return object_list
+
+# EOF
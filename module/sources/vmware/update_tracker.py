@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+import json
+import os
+import time
+
+# noinspection PyUnresolvedReferences
+from pyVmomi import vim, vmodl
+
+from module.sources.vmware.property_collector import VMWarePropertyPaths
+from module.common.logging import get_logger
+from module.common.misc import plural
+
+log = get_logger()
+
+
+class VMWareUpdateTracker:
+    """
+    Keeps a PropertyCollector filter for all objects of a type in the vCenter session across runs.
+
+    The vCenter session cookie, the filter and the version of the last received update are stored in
+    a state file in the NetBox cache directory. On the next run WaitForUpdatesEx returns only the objects
+    which changed since this version. All objects are read again if the state is invalid, the session
+    or the filter are gone, vCenter rejects the version, the source settings changed or the full sync
+    interval passed.
+    """
+
+    def __init__(self, cache_directory, source_name, host_fqdn, full_sync_interval_in_hours, settings_hash=None):
+        """
+        Parameters
+        ----------
+        cache_directory: str
+            directory to store the state file in
+        source_name: str
+            name of the source
+        host_fqdn: str
+            vCenter host name, state of a different host will be ignored
+        full_sync_interval_in_hours: int
+            hours after which all objects are read again
+        settings_hash: str
+            hash of the source settings, all objects are read again if the settings changed
+        """
+
+        self.state_file = os.path.join(cache_directory, f"vcenter-{source_name}-updates.json")
+        self.host_fqdn = host_fqdn
+        self.full_sync_interval = full_sync_interval_in_hours * 3600
+        self.settings_hash = settings_hash
+
+        # True if all objects have been read during this run
+        self.full_sync = True
+
+        # managed object ID and NetBox ID of all objects which have not changed since the last run
+        self.unchanged_objects = dict()
+
+        self.state = self.read_state()
+
+    @property
+    def session_cookie(self):
+        return self.state.get("session_cookie")
+
+    def read_state(self):
+        """
+        Read the state of the previous run
+
+        Returns
+        -------
+        dict: the state, empty if no valid state was found
+        """
+
+        if not os.path.isfile(self.state_file):
+            return dict()
+
+        try:
+            with open(self.state_file) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError) as e:
+            log.warning(f"Unable to read vCenter update state file '{self.state_file}': {e}")
+            return dict()
+
+        if not isinstance(state, dict) or state.get("host_fqdn") != self.host_fqdn:
+            return dict()
+
+        # vCenter accepts a version only once. Remove it from the file in case this run doesn't finish.
+        if state.get("version") is not None:
+            self.write_state({k: v for k, v in state.items() if k != "version"})
+
+        return state
+
+    def write_state(self, state):
+        """
+        Write state to the state file, only readable by the current user
+        """
+
+        temp_file = f"{self.state_file}.tmp"
+        try:
+            with os.fdopen(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as state_file:
+                json.dump(state, state_file)
+            os.replace(temp_file, self.state_file)
+        except OSError as e:
+            log.warning(f"Unable to write vCenter update state file '{self.state_file}': {e}")
+            return False
+
+        return True
+
+    def save(self, session_cookie, object_ids):
+        """
+        Save the state of this run to be used by the next run
+
+        Parameters
+        ----------
+        session_cookie: str
+            cookie of the current vCenter session
+        object_ids: dict
+            NetBox IDs of all synced objects by managed object ID
+
+        Returns
+        -------
+        bool: True if the state has been saved
+        """
+
+        if self.state.get("version") is None or session_cookie is None:
+            return False
+
+        self.state["host_fqdn"] = self.host_fqdn
+        self.state["session_cookie"] = session_cookie
+        self.state["settings_hash"] = self.settings_hash
+        self.state["object_ids"] = object_ids
+
+        return self.write_state(self.state)
+
+    def full_sync_due(self):
+
+        return time.time() - self.state.get("last_full_sync", 0) >= self.full_sync_interval
+
+    def get_update_collector(self, session):
+        """
+        Return the PropertyCollector of the previous run if it still exists in the current session
+        """
+
+        collector_id = self.state.get("collector")
+        if collector_id is None:
+            return None
+
+        # noinspection PyProtectedMember
+        return vmodl.query.PropertyCollector(collector_id, session.propertyCollector._stub)
+
+    def destroy_update_collector(self, session):
+        """
+        Remove the PropertyCollector, its filter and the container view of the previous run
+        """
+
+        # noinspection PyProtectedMember
+        stub = session.propertyCollector._stub
+
+        for key, managed_object_type in [("collector", vmodl.query.PropertyCollector),
+                                         ("view", vim.view.ContainerView)]:
+
+            managed_object_id = self.state.pop(key, None)
+            if managed_object_id is None:
+                continue
+
+            # noinspection PyBroadException
+            try:
+                if key == "collector":
+                    managed_object_type(managed_object_id, stub).DestroyPropertyCollector()
+                else:
+                    managed_object_type(managed_object_id, stub).Destroy()
+            except Exception:
+                pass
+
+        for key in ["filter", "version", "property_paths", "object_ids"]:
+            self.state.pop(key, None)
+
+    @staticmethod
+    def wait_for_updates(update_collector, version, handler):
+        """
+        Call WaitForUpdatesEx until all updates since version have been received
+
+        Parameters
+        ----------
+        update_collector: vmodl.query.PropertyCollector
+            collector the filter belongs to
+        version: str
+            version of the last received update, empty string to receive all objects
+        handler: function
+            called with each vmodl.query.PropertyCollector.ObjectUpdate
+
+        Returns
+        -------
+        str: version of the last received update
+        """
+
+        options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=0)
+
+        while True:
+            update_set = update_collector.WaitForUpdatesEx(version=version, options=options)
+
+            # no further updates
+            if update_set is None:
+                break
+
+            version = update_set.version
+
+            for filter_update in update_set.filterSet or list():
+                for object_update in filter_update.objectSet or list():
+                    handler(object_update)
+
+            if update_set.truncated is not True:
+                break
+
+        return version
+
+    def get_objects(self, property_collector, object_type, property_paths):
+        """
+        Retrieve all objects of a type which changed since the last run or all objects
+        if this is not possible.
+
+        Parameters
+        ----------
+        property_collector: VMWarePropertyCollector
+            collector to register the objects with
+        object_type: pyVmomi managed object type
+            type of the objects to retrieve, i.e. vim.VirtualMachine
+        property_paths: list
+            property paths to retrieve
+
+        Returns
+        -------
+        list, None: of VMWareObject, None if retrieving objects failed
+        """
+
+        self.full_sync = True
+        self.unchanged_objects = dict()
+
+        if self.state.get("version") is None:
+            log.debug("No vCenter update state from a previous run found")
+        elif self.state.get("property_paths") != sorted(property_paths):
+            log.debug("Retrieved vCenter properties changed since the previous run")
+        elif self.state.get("settings_hash") != self.settings_hash:
+            log.info("Settings of source changed since the previous run")
+        elif self.full_sync_due() is True:
+            log.info(f"Last full sync of '{object_type.__name__}' objects is older than "
+                     f"{self.full_sync_interval // 3600} hour{plural(self.full_sync_interval // 3600)}")
+        else:
+            object_list = self.get_changed_objects(property_collector, object_type, property_paths)
+            if object_list is not None:
+                self.full_sync = False
+                return object_list
+
+        log.info(f"Reading all '{object_type.__name__}' objects from vCenter")
+
+        return self.get_all_objects(property_collector, object_type, property_paths)
+
+    def get_changed_objects(self, property_collector, object_type, property_paths):
+        """
+        Retrieve all objects which changed since the version of the last run
+
+        Returns
+        -------
+        list, None: of VMWareObject, None if the changes could not be determined
+        """
+
+        session = property_collector.session
+        changed_objects = dict()
+        removed_object_ids = set()
+
+        def handle_update(object_update):
+            # noinspection PyProtectedMember
+            managed_object_id = object_update.obj._GetMoId()
+            if object_update.kind == "leave":
+                changed_objects.pop(managed_object_id, None)
+                removed_object_ids.add(managed_object_id)
+            else:
+                changed_objects[managed_object_id] = object_update.obj
+                removed_object_ids.discard(managed_object_id)
+
+        try:
+            update_collector = self.get_update_collector(session)
+            # noinspection PyProtectedMember
+            if self.state.get("filter") not in [x._GetMoId() for x in update_collector.filter]:
+                log.info("vCenter update filter of the previous run not found")
+                return None
+
+            version = self.wait_for_updates(update_collector, self.state.get("version"), handle_update)
+
+        except Exception as e:
+            log.info(f"Unable to retrieve vCenter updates since the previous run: {e}")
+            return None
+
+        object_list = property_collector.retrieve_objects(object_type, list(changed_objects.values()), property_paths)
+        if object_list is None:
+            return None
+
+        self.state["version"] = version
+        self.unchanged_objects = {
+            k: v for k, v in (self.state.get("object_ids") or dict()).items()
+            if k not in changed_objects and k not in removed_object_ids
+        }
+
+        log.info(f"vCenter reported {len(changed_objects)} changed and {len(removed_object_ids)} removed "
+                 f"'{object_type.__name__}' object{plural(len(changed_objects) + len(removed_object_ids))} "
+                 f"since the previous run")
+
+        return object_list
+
+    def get_all_objects(self, property_collector, object_type, property_paths):
+        """
+        Create a new filter for all objects of a type and retrieve all objects with their initial update
+
+        Returns
+        -------
+        list, None: of VMWareObject, None if retrieving objects failed
+        """
+
+        session = property_collector.session
+        paths = VMWarePropertyPaths(property_paths)
+        object_list = list()
+
+        def handle_update(object_update):
+            if object_update.kind != "enter":
+                return
+            object_list.append(property_collector.add_object(
+                object_update.obj, {x.name: x.val for x in object_update.changeSet or list()}, paths
+            ))
+
+        self.destroy_update_collector(session)
+
+        try:
+            container_view = session.viewManager.CreateContainerView(
+                container=session.rootFolder, type=[object_type], recursive=True
+            )
+            update_collector = session.propertyCollector.CreatePropertyCollector()
+
+            # noinspection PyProtectedMember
+            self.state["view"] = container_view._GetMoId()
+            # noinspection PyProtectedMember
+            self.state["collector"] = update_collector._GetMoId()
+
+            property_filter = update_collector.CreateFilter(
+                spec=property_collector.get_filter_spec(object_type, property_paths, container_view=container_view),
+                partialUpdates=False
+            )
+
+            version = self.wait_for_updates(update_collector, "", handle_update)
+
+        except Exception as e:
+            log.error(f"Retrieving '{object_type.__name__}' objects with vCenter update filter failed: {e}")
+            self.destroy_update_collector(session)
+            return None
+
+        # noinspection PyProtectedMember
+        self.state["filter"] = property_filter._GetMoId()
+        self.state["version"] = version
+        self.state["property_paths"] = sorted(property_paths)
+        self.state["last_full_sync"] = time.time()
+
+        log.debug2(f"Retrieved {len(object_list)} '{object_type.__name__}' object{plural(len(object_list))} "
+                   f"with vCenter update filter")
+
+        return object_list
+
+# EOF
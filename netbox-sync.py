@@ -20,7 +20,7 @@ from module.common.cli_parser import parse_command_line
 from module.common.logging import setup_logging
 from module.netbox.connection import NetBoxHandler
 from module.netbox.inventory import NetBoxInventory
-from module.sources import instantiate_sources
+from module.sources import instantiate_sources, collect_source_data
 from module.config.parser import ConfigParser
 from module.common.config import CommonConfig
 from module.config.file_output import ConfigFileOutput
@@ -105,6 +105,9 @@ def main():
     # initialize basic data needed for syncing
     nb_handler.initialize_basic_data()
 
+    # retrieve data from all sources, possibly in parallel
+    collect_source_data(sources, common_config.max_parallel_sources)
+
     # loop over sources and patch netbox data
     for source in sources:
         log.debug(f"Retrieving data from source '{source.name}'")
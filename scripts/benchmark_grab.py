@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+"""
+Compares grab() with the previous implementation which split the path and copied every
+dict on each call. Both have to return the same result for a set of structures and paths.
+Then the duration of both implementations is measured.
+
+usage: scripts/benchmark_grab.py [number_of_iterations]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from module.common.misc import grab
+
+
+def grab_reference(structure=None, path=None, separator=".", fallback=None):
+    """
+    previous implementation of grab()
+    """
+
+    max_recursion_level = 100
+
+    current_level = 0
+    levels = len(path.split(separator))
+
+    if structure is None or path is None:
+        return fallback
+
+    # noinspection PyBroadException
+    def traverse(r_structure, r_path):
+        nonlocal current_level
+        current_level += 1
+
+        if current_level > max_recursion_level:
+            return fallback
+
+        for attribute in r_path.split(separator):
+            if isinstance(r_structure, dict):
+                r_structure = {k.lower(): v for k, v in r_structure.items()}
+
+            try:
+                if isinstance(r_structure, list):
+                    data = r_structure[int(attribute)]
+                elif isinstance(r_structure, dict):
+                    data = r_structure.get(attribute.lower())
+                else:
+                    data = getattr(r_structure, attribute)
+
+            except Exception:
+                return fallback
+
+            if current_level == levels:
+                return data if data is not None else fallback
+            else:
+                return traverse(data, separator.join(r_path.split(separator)[1:]))
+
+    return traverse(structure, path)
+
+
+class Interface:
+
+    def __init__(self, data):
+        self.data = data
+        self.nb_id = data.get("id")
+
+
+def test_cases():
+
+    device = {"id": 12, "name": "server01", "Serial": "ABC123", "tags": [{"name": "tag1"}, {"name": "tag2"}]}
+    interface_data = {
+        "id": 42,
+        "name": "eth0",
+        "mac_address": "00:50:56:AA:BB:CC",
+        "enabled": False,
+        "mtu": None,
+        "device": device,
+        "tagged_vlans": [{"vid": 10}, {"vid": 20}],
+        "custom_fields": {"Last_Seen": "2024-01-01", "empty": ""}
+    }
+    interface = Interface(interface_data)
+
+    return [
+        (interface, "data.mac_address", None),
+        (interface, "data.enabled", None),
+        (interface, "data.mtu", 1500),
+        (interface, "data.device.name", None),
+        (interface, "data.device.serial", None),
+        (interface, "data.Device.Name", None),
+        (interface, "data.device.tags.1.name", None),
+        (interface, "data.device.tags.-1.name", None),
+        (interface, "data.device.tags.5.name", "missing"),
+        (interface, "data.device.tags.first.name", "missing"),
+        (interface, "data.tagged_vlans.0.vid", None),
+        (interface, "data.custom_fields.last_seen", None),
+        (interface, "data.custom_fields.empty", None),
+        (interface, "data.custom_fields.unknown", "missing"),
+        (interface, "data.mac_address.upper", None),
+        (interface, "nb_id", None),
+        (interface, "data.missing.deeper.path", "missing"),
+        (interface, "data", None),
+        (interface_data, "device.id", None),
+        ([interface_data], "0.name", None),
+        (["a", "b"], "2", "missing"),
+        ("just a string", "missing", "missing"),
+        (None, "data.name", "missing"),
+        ({"a": {"b": {"c": 1}}}, "a/b/c", None),
+    ]
+
+
+def main():
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    cases = test_cases()
+
+    for structure, path, fallback in cases:
+        separator = "/" if "/" in path else "."
+        expected = grab_reference(structure, path, separator=separator, fallback=fallback)
+        result = grab(structure, path, separator=separator, fallback=fallback)
+        if result != expected:
+            print(f"result mismatch for path '{path}': got '{result}', expected '{expected}'")
+            exit(1)
+
+    print(f"results of {len(cases)} test cases identical")
+
+    for name, function in [("previous grab", grab_reference), ("grab", grab)]:
+        start_time = time.time()
+        for _ in range(iterations // len(cases)):
+            for structure, path, fallback in cases:
+                function(structure, path, separator="/" if "/" in path else ".", fallback=fallback)
+
+        print(f"{name + ':':<18} {time.time() - start_time:.2f}s for {iterations // len(cases) * len(cases)} calls")
+
+
+if __name__ == "__main__":
+    main()
+
+# EOF
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 - 2023 Ricardo Bartels. All rights reserved.
+#
+#  netbox-sync.py
+#
+#  This work is licensed under the terms of the MIT license.
+#  For a copy, see file LICENSE.txt included in this
+#  repository or visit: <https://opensource.org/licenses/MIT>.
+
+"""
+Measures the memory used by the NetBox inventory after reading synthetic NetBox objects.
+
+A virtual machine with one interface and one IP address is generated for each requested VM.
+The data is passed through json.loads() page by page to resemble data returned from the NetBox API.
+
+usage: scripts/benchmark_object_memory.py [number_of_vms]
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+# noinspection PyUnresolvedReferences
+from module.netbox import NBSite, NBCluster, NBVM, NBVMInterface, NBIPAddress
+from module.netbox.inventory import NetBoxInventory
+
+page_size = 1000
+base_url = "https://netbox.example.com/api"
+
+
+def brief(api_path, object_id, name):
+    return {
+        "id": object_id,
+        "url": f"{base_url}/{api_path}/{object_id}/",
+        "display": name,
+        "name": name
+    }
+
+
+def choice(value):
+    return {"value": value, "label": value.capitalize()}
+
+
+def common(api_path, object_id, display):
+    return {
+        "id": object_id,
+        "url": f"{base_url}/{api_path}/{object_id}/",
+        "display": display,
+        "tags": [],
+        "custom_fields": {},
+        "created": "2024-01-01T00:00:00.000000Z",
+        "last_updated": f"2024-01-01T00:00:{object_id % 60:02d}.{object_id:06d}Z"
+    }
+
+
+def vm_data(vm_id):
+    return {
+        **common("virtualization/virtual-machines", vm_id, f"vm-{vm_id}"),
+        "name": f"vm-{vm_id}",
+        "status": choice("active"),
+        "site": brief("dcim/sites", 1, "site"),
+        "cluster": brief("virtualization/clusters", 1, "cluster"),
+        "role": None,
+        "tenant": None,
+        "platform": None,
+        "primary_ip": None,
+        "primary_ip4": None,
+        "primary_ip6": None,
+        "vcpus": 2.0,
+        "memory": 4096,
+        "disk": 40,
+        "description": "",
+        "comments": "",
+        "local_context_data": None,
+        "interface_count": 1,
+        "virtual_disk_count": 0
+    }
+
+
+def interface_data(interface_id, vm_id):
+    return {
+        **common("virtualization/interfaces", interface_id, "eth0"),
+        "virtual_machine": brief("virtualization/virtual-machines", vm_id, f"vm-{vm_id}"),
+        "name": "eth0",
+        "enabled": True,
+        "parent": None,
+        "bridge": None,
+        "mtu": None,
+        "mac_address": f"00:50:56:{(interface_id >> 16) & 255:02x}:{(interface_id >> 8) & 255:02x}:"
+                       f"{interface_id & 255:02x}",
+        "description": "",
+        "mode": None,
+        "untagged_vlan": None,
+        "tagged_vlans": [],
+        "vrf": None,
+        "count_ipaddresses": 1,
+        "count_fhrp_groups": 0
+    }
+
+
+def ip_data(ip_id, interface_id):
+    return {
+        **common("ipam/ip-addresses", ip_id, f"10.{(ip_id >> 16) & 255}.{(ip_id >> 8) & 255}.{ip_id & 255}/16"),
+        "family": {"value": 4, "label": "IPv4"},
+        "address": f"10.{(ip_id >> 16) & 255}.{(ip_id >> 8) & 255}.{ip_id & 255}/16",
+        "vrf": None,
+        "tenant": None,
+        "status": choice("active"),
+        "role": None,
+        "assigned_object_type": "virtualization.vminterface",
+        "assigned_object_id": interface_id,
+        "assigned_object": brief("virtualization/interfaces", interface_id, "eth0"),
+        "nat_inside": None,
+        "nat_outside": [],
+        "dns_name": "",
+        "description": "",
+        "comments": ""
+    }
+
+
+def pages(generator, count):
+    """
+    emulate decoding of paginated NetBox API results
+    """
+    for offset in range(0, count, page_size):
+        page = [generator(x + 1) for x in range(offset, min(offset + page_size, count))]
+        yield json.loads(json.dumps(page))
+
+
+def main():
+
+    number_of_vms = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    inventory = NetBoxInventory()
+    inventory.netbox_api_version = "4.0"
+
+    inventory.add_object(NBSite, data={**common("dcim/sites", 1, "site"), "name": "site", "slug": "site"},
+                         read_from_netbox=True)
+    inventory.add_object(NBCluster, data={**common("virtualization/clusters", 1, "cluster"),
+                                          "name": "cluster", "site": brief("dcim/sites", 1, "site")},
+                         read_from_netbox=True)
+
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.time()
+
+    for object_class, generator in [(NBVM, vm_data),
+                                    (NBVMInterface, lambda x: interface_data(x, x)),
+                                    (NBIPAddress, lambda x: ip_data(x, x))]:
+        for page in pages(generator, number_of_vms):
+            for object_data in page:
+                inventory.add_object(object_class, data=object_data, read_from_netbox=True)
+            del page
+
+    inventory.resolve_relations()
+
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    number_of_objects = number_of_vms * 3
+
+    print(f"objects:           {number_of_objects}")
+    print(f"duration:          {time.time() - start_time:.2f}s")
+    print(f"memory after run:  {current / 1024 / 1024:.1f} MiB")
+    print(f"peak memory:       {peak / 1024 / 1024:.1f} MiB")
+    print(f"bytes per object:  {current / number_of_objects:.0f}")
+
+
+if __name__ == "__main__":
+    main()
+
+# EOF